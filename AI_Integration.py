@@ -4,9 +4,11 @@ import speech_recognition as sr
 import pyttsx3
 import os
 import docx
-import json
 import tempfile
 import random
+from evaluation import save_progress, load_progress
+from noise_calibration import NoiseCalibrator
+from session_memory import get_session, current_session_id
 
 def main():
     # Load API Key from docx file
@@ -38,40 +40,15 @@ def main():
 
     # Initialize Speech Recognition
     recognizer = sr.Recognizer()
+    # Stored ambient-noise profile, adapted from silence frames while listening
+    calibrator = NoiseCalibrator(recognizer)
+
+    # Per-session transcript buffers, bounded and evicted when idle
+    session = get_session(current_session_id())
 
     # Streamlit UI
     st.title("Verbal Communication Skills Trainer")
 
-    # User Progress Tracking
-    PROGRESS_FILE = "progress.json"
-
-    def save_progress(user_input, feedback):
-        data = []
-        if os.path.exists(PROGRESS_FILE) and os.stat(PROGRESS_FILE).st_size > 0:
-            with open(PROGRESS_FILE, "r") as file:
-                try:
-                    data = json.load(file)
-                except json.JSONDecodeError:
-                    data = []
-        data.append({"user_input": user_input, "feedback": feedback})
-        with open(PROGRESS_FILE, "w") as file:
-            json.dump(data, file, indent=4)
-
-    def load_progress():
-        if not os.path.exists(PROGRESS_FILE) or os.stat(PROGRESS_FILE).st_size == 0:
-            return "No progress recorded yet."
-        try:
-            with open(PROGRESS_FILE, "r") as file:
-                data = json.load(file)
-                if data:
-                    return "\n\n".join([
-                        f"**User Input:**\n{entry['user_input']}\n\n**AI Feedback:**\n{entry['feedback']}\n{'-'*40}"
-                        for entry in data
-                    ])
-                return "No progress recorded yet."
-        except json.JSONDecodeError:
-            return "No progress recorded yet."
-
     # Training Modules
     st.subheader("Training Modules")
     module = st.selectbox("Choose a module:", ["Impromptu Speaking", "Storytelling", "Conflict Resolution", "General Feedback"])
@@ -103,8 +80,7 @@ def main():
                 user_input = st.text_area("Enter your response:", placeholder=placeholder_text, key="training_text_input")
 
             elif input_method == "Voice Input":
-                if "training_voice_input" not in st.session_state:
-                    st.session_state["training_voice_input"] = ""
+                voice_input = session.transcript("training")
                 if "training_listening" not in st.session_state:
                     st.session_state["training_listening"] = False
 
@@ -114,21 +90,25 @@ def main():
                         st.session_state["training_listening"] = True
                         try:
                             with sr.Microphone() as source:
-                                recognizer.adjust_for_ambient_noise(source, duration=1)
+                                calibrator.prepare(source)
                                 st.info("Listening... Press 'Stop Voice Input' to end.")
-                                while st.session_state["training_listening"]:
-                                    try:
-                                        audio = recognizer.listen(source)
-                                        text = recognizer.recognize_google(audio)
-                                        if text:
-                                            st.session_state["training_voice_input"] += " " + text
-                                            st.write(f"You said: {st.session_state['training_voice_input']}")
-                                    except sr.UnknownValueError:
-                                        st.warning("Could not understand audio.")
-                                    except sr.RequestError:
-                                        st.warning("Speech recognition service error.")
-                                    except Exception as e:
-                                        st.error(f"Error: {str(e)}")
+                                try:
+                                    while st.session_state["training_listening"]:
+                                        try:
+                                            audio = recognizer.listen(source)
+                                            calibrator.observe()
+                                            text = recognizer.recognize_google(audio)
+                                            if text:
+                                                voice_input.append(text)
+                                                st.write(f"You said: {text}")
+                                        except sr.UnknownValueError:
+                                            st.warning("Could not understand audio.")
+                                        except sr.RequestError:
+                                            st.warning("Speech recognition service error.")
+                                        except Exception as e:
+                                            st.error(f"Error: {str(e)}")
+                                finally:
+                                    calibrator.flush()
                         except OSError as e:
                             st.error(f"Error accessing microphone: {e}. Please check permissions or device connection.")
                         except Exception as e:
@@ -137,7 +117,7 @@ def main():
                     if st.button("Stop Voice Input", key="training_stop_voice_input"):
                         st.session_state["training_listening"] = False
                         st.success("Voice input stopped.")
-                user_input = st.session_state["training_voice_input"]
+                user_input = voice_input.text
 
             elif input_method == "Upload Audio File":
                 uploaded_file = st.file_uploader("Upload Audio File", type=["wav", "mp3", "flac"], key="training_audio_upload")
@@ -200,8 +180,7 @@ def main():
             user_input = st.text_area("Enter your message:", placeholder="Example: I often struggle with filler words like 'um' and 'uh'. How can I improve?", key="general_text_input")
 
         elif input_method == "Voice Input":
-            if "general_voice_input" not in st.session_state:
-                st.session_state["general_voice_input"] = ""
+            voice_input = session.transcript("general")
             if "general_listening" not in st.session_state:
                 st.session_state["general_listening"] = False
 
@@ -211,21 +190,25 @@ def main():
                     st.session_state["general_listening"] = True
                     try:
                         with sr.Microphone() as source:
-                            recognizer.adjust_for_ambient_noise(source, duration=1)
+                            calibrator.prepare(source)
                             st.info("Listening... Press 'Stop Voice Input' to end.")
-                            while st.session_state["general_listening"]:
-                                try:
-                                    audio = recognizer.listen(source)
-                                    text = recognizer.recognize_google(audio)
-                                    if text:
-                                        st.session_state["general_voice_input"] += " " + text
-                                        st.write(f"You said: {st.session_state['general_voice_input']}")
-                                except sr.UnknownValueError:
-                                    st.warning("Could not understand audio.")
-                                except sr.RequestError:
-                                    st.warning("Speech recognition service error.")
-                                except Exception as e:
-                                    st.error(f"Error: {str(e)}")
+                            try:
+                                while st.session_state["general_listening"]:
+                                    try:
+                                        audio = recognizer.listen(source)
+                                        calibrator.observe()
+                                        text = recognizer.recognize_google(audio)
+                                        if text:
+                                            voice_input.append(text)
+                                            st.write(f"You said: {text}")
+                                    except sr.UnknownValueError:
+                                        st.warning("Could not understand audio.")
+                                    except sr.RequestError:
+                                        st.warning("Speech recognition service error.")
+                                    except Exception as e:
+                                        st.error(f"Error: {str(e)}")
+                            finally:
+                                calibrator.flush()
                     except OSError as e:
                         st.error(f"Error accessing microphone: {e}. Please check permissions or device connection.")
                     except Exception as e:
@@ -234,7 +217,7 @@ def main():
                     if st.button("Stop Voice Input", key="general_stop_voice_input"):
                         st.session_state["general_listening"] = False
                         st.success("Voice input stopped.")
-                user_input = st.session_state["general_voice_input"]
+                user_input = voice_input.text
 
         elif input_method == "Upload Audio File":
             uploaded_file = st.file_uploader("Upload Audio File", type=["wav", "mp3", "flac"], key="general_audio_upload")
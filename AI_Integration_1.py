@@ -1,10 +1,14 @@
 import streamlit as st
 import os
-import json
 from google.cloud import speech, texttospeech
 import google.generativeai as genai
 import speech_recognition as sr
 import docx
+from progress_store import get_store
+from evaluation import build_chat_prompt, build_voice_prompt
+from speculative import SpeculativeEvaluator, run_in_background
+from session_memory import get_session, current_session_id
+from noise_calibration import NoiseCalibrator
 
 # Load API Key from docx file
 def get_api_key_from_docx(docx_path):
@@ -31,24 +35,23 @@ tts_client = texttospeech.TextToSpeechClient()
 
 # Progress log storage
 LOG_FILE = "progress_log.json"
+PROGRESS_DISPLAY_LIMIT = 50
+# Returns the error rather than reporting it, since voice entries are saved
+# from a background thread that cannot call Streamlit
 def save_progress(log_entry):
     try:
-        if os.path.exists(LOG_FILE):
-            with open(LOG_FILE, "r") as f:
-                logs = json.load(f)
-        else:
-            logs = []
-        logs.append(log_entry)
-        with open(LOG_FILE, "w") as f:
-            json.dump(logs, f, indent=4)
+        get_store(LOG_FILE).append(log_entry)
     except Exception as e:
+        print(f"Failed to save progress: {e}")
+        return e
+    return None
+
+def report_save(error):
+    if error is not None:
         st.error("Failed to save progress.")
 
 def load_progress():
-    if os.path.exists(LOG_FILE):
-        with open(LOG_FILE, "r") as f:
-            return json.load(f)
-    return []
+    return get_store(LOG_FILE).recent_with_total(PROGRESS_DISPLAY_LIMIT)
 
 st.title("Verbal Communication Skills Trainer")
 
@@ -56,36 +59,46 @@ st.title("Verbal Communication Skills Trainer")
 st.header("Chat with AI Coach")
 user_input = st.text_area("You:", "")
 if st.button("Send") and user_input:
-    response = genai.GenerativeModel("gemini-1.5-pro-latest").generate_content(f"You are a communication coach. Provide detailed and constructive feedback on: {user_input}").text
+    response = genai.GenerativeModel("gemini-1.5-pro-latest").generate_content(build_chat_prompt(user_input)).text
     st.write("AI Coach:", response)
-    save_progress({"type": "chat", "input": user_input, "feedback": response})
+    report_save(save_progress({"type": "chat", "input": user_input, "feedback": response}))
 
 # Voice-based training
 st.write("Click the button and start speaking...")
 recognizer = sr.Recognizer()
+calibrator = NoiseCalibrator(recognizer)
+session = get_session(current_session_id())
+transcription = session.transcript("voice")
+audio_data = session.audio("voice")
+
+def generate_voice_feedback(prompt):
+    return genai.GenerativeModel("gemini-1.5-pro-latest").generate_content(prompt).text
 
 if 'recording' not in st.session_state:
     st.session_state.recording = False
-if 'audio_data' not in st.session_state:
-    st.session_state.audio_data = []
-if 'transcription' not in st.session_state:
-    st.session_state.transcription = ""
+if 'speculative' not in st.session_state:
+    st.session_state.speculative = SpeculativeEvaluator(generate=generate_voice_feedback, prompt_fn=build_voice_prompt)
 
 if st.button("Start Recording") and not st.session_state.recording:
     st.session_state.recording = True
-    st.session_state.audio_data = []
-    st.session_state.transcription = ""
+    audio_data.clear()
+    transcription.clear()
+    st.session_state.speculative.reset()
     st.write("Listening... Click 'Stop Recording' to finish.")
 
 if st.session_state.recording:
     with sr.Microphone() as source:
+        # Calibrates once per microphone, then reuses the stored threshold
+        calibrator.prepare(source)
         try:
             audio = recognizer.listen(source, timeout=3)
-            st.session_state.audio_data.append(audio)
+            calibrator.observe()
+            audio_data.append(audio)
             try:
                 text = recognizer.recognize_google(audio)
-                st.session_state.transcription += " " + text
-                st.text_area("You:", value=st.session_state.transcription)
+                transcription.append(text)
+                st.session_state.speculative.update(transcription, transcription.word_count)
+                st.text_area("You:", value=transcription.text)
             except sr.UnknownValueError:
                 pass
             except sr.RequestError:
@@ -95,13 +108,15 @@ if st.session_state.recording:
 
 if st.button("Stop Recording") and st.session_state.recording:
     st.session_state.recording = False
-    full_audio = sr.AudioData(b"".join(a.frame_data for a in st.session_state.audio_data), source.SAMPLE_RATE, source.SAMPLE_WIDTH)
     try:
+        if not audio_data:
+            raise sr.UnknownValueError()
+        full_audio = sr.AudioData(audio_data.frame_data(), audio_data.sample_rate, audio_data.sample_width)
         text_output = recognizer.recognize_google(full_audio)
         st.write("Transcription:", text_output)
-        response = genai.GenerativeModel("gemini-1.5-pro-latest").generate_content(f"Analyze this speech in detail, providing feedback on clarity, pronunciation, and confidence: {text_output}").text
+        response = st.session_state.speculative.finalize(text_output)
         st.write("AI Feedback:", response)
-        save_progress({"type": "voice", "transcription": text_output, "feedback": response})
+        st.session_state.pending_save = run_in_background(save_progress, {"type": "voice", "transcription": text_output, "feedback": response})
     except sr.UnknownValueError:
         st.write("Sorry, could not understand the speech.")
     except sr.RequestError:
@@ -122,12 +137,18 @@ if st.button("Start Training"):
     if st.button("Get Feedback"):
         response = genai.GenerativeModel("gemini-1.5-pro-latest").generate_content(f"Analyze this response and provide specific, actionable feedback on content, structure, and tone: {user_response}").text
         st.write("AI Feedback:", response)
-        save_progress({"type": "training", "module": training_type, "response": user_response, "feedback": response})
+        report_save(save_progress({"type": "training", "module": training_type, "response": user_response, "feedback": response}))
+
+# Surface the result of a background save once the page has rendered
+if "pending_save" in st.session_state:
+    report_save(st.session_state.pop("pending_save").result())
 
 # View Progress
 if st.button("View Progress"):
-    progress_logs = load_progress()
+    progress_logs, total = load_progress()
     if progress_logs:
+        if total > len(progress_logs):
+            st.write(f"({total - len(progress_logs)} older entries not shown)")
         st.json(progress_logs)
     else:
         st.write("No progress recorded yet.")
@@ -4,16 +4,23 @@ import speech_recognition as sr
 import pyttsx3
 import os
 import docx
-import json
 import tempfile
 import random
 import unittest
+from evaluation import (API_KEY_DOCX, GENERAL_MODULE, MODULES, build_prompt, generate_feedback,
+                        parse_feedback, format_feedback, save_progress, load_progress, search_progress,
+                        find_similar_feedback,
+                        extract_scores, get_strengths, get_improvements, get_overall)
+from speculative import SpeculativeEvaluator, run_in_background, speak_in_background
+from session_memory import get_session, current_session_id
+from profiling import profile_section, profiling_requested, format_summary
+from noise_calibration import NoiseCalibrator
 
 def main():
     # Load API Key from docx file
     def load_api_key():
         try:
-            doc = docx.Document("/home/harsha/Downloads/Gemini -API.docx")
+            doc = docx.Document(API_KEY_DOCX)
             return doc.paragraphs[0].text.strip()
         except FileNotFoundError:
             st.error("API key file not found. Please ensure 'api_key.docx' exists.")
@@ -39,6 +46,20 @@ def main():
 
     # Initialize Speech Recognition
     recognizer = sr.Recognizer()
+    # Stored ambient-noise profile, adapted from silence frames while listening
+    calibrator = NoiseCalibrator(recognizer)
+
+    # Per-session transcript buffers, bounded and evicted when idle
+    session = get_session(current_session_id())
+
+    # Gemini model shared by draft and final evaluations
+    model = genai.GenerativeModel("gemini-1.5-pro")
+    pending_saves = []
+
+    def show_similar_notice(similar):
+        st.info(f"This response is {similar['similarity']:.0%} similar to one you gave on "
+                f"{similar.get('timestamp', 'an earlier date')}, so the earlier feedback is shown. "
+                f"Tick 'Re-evaluate similar responses' to get fresh feedback.")
 
     # Streamlit UI
     st.title("Verbal Communication Skills Trainer")
@@ -46,41 +67,11 @@ def main():
     # Onboarding Instructions
     st.info("Welcome to the Verbal Communication Skills Trainer! Choose a module and input method to get started.")
 
-    # User Progress Tracking
-    PROGRESS_FILE = "progress.json"
-
-    def save_progress(user_input, feedback):
-        data = []
-        if os.path.exists(PROGRESS_FILE) and os.stat(PROGRESS_FILE).st_size > 0:
-            with open(PROGRESS_FILE, "r") as file:
-                try:
-                    data = json.load(file)
-                except json.JSONDecodeError:
-                    data = []
-        data.append({"user_input": user_input, "feedback": feedback})
-        with open(PROGRESS_FILE, "w") as file:
-            json.dump(data, file, indent=4)
-
-    def load_progress():
-        if not os.path.exists(PROGRESS_FILE) or os.stat(PROGRESS_FILE).st_size == 0:
-            return "No progress recorded yet."
-        try:
-            with open(PROGRESS_FILE, "r") as file:
-                data = json.load(file)
-                if data:
-                    return "\n\n".join([
-                        f"**User Input:**\n{entry['user_input']}\n\n**AI Feedback:**\n{entry['feedback']}\n{'-'*40}"
-                        for entry in data
-                    ])
-                return "No progress recorded yet."
-        except json.JSONDecodeError:
-            return "No progress recorded yet."
-
     # Training Modules
     st.subheader("Training Modules")
-    module = st.selectbox("Choose a module:", ["Impromptu Speaking", "Storytelling", "Conflict Resolution", "General Feedback"])
+    module = st.selectbox("Choose a module:", MODULES)
 
-    if module != "General Feedback":
+    if module != GENERAL_MODULE:
         placeholder_text = ""
         if module == "Impromptu Speaking":
             placeholder_text = "Example: Teamwork is essential because it allows people to collaborate, share ideas, and solve problems efficiently."
@@ -107,10 +98,11 @@ def main():
                 user_input = st.text_area("Enter your response:", placeholder=placeholder_text, key="training_text_input")
 
             elif input_method == "Voice Input":
-                if "training_voice_input" not in st.session_state:
-                    st.session_state["training_voice_input"] = ""
+                voice_input = session.transcript("training")
                 if "training_listening" not in st.session_state:
                     st.session_state["training_listening"] = False
+                if "training_speculative" not in st.session_state or st.session_state["training_speculative"].module != module:
+                    st.session_state["training_speculative"] = SpeculativeEvaluator(module, model)
 
                 col1, col2 = st.columns([1, 1])
                 with col1:
@@ -118,21 +110,26 @@ def main():
                         st.session_state["training_listening"] = True
                         try:
                             with sr.Microphone() as source:
-                                recognizer.adjust_for_ambient_noise(source, duration=1)
+                                calibrator.prepare(source)
                                 st.info("Listening... Press 'Stop Voice Input' to end.")
-                                while st.session_state["training_listening"]:
-                                    try:
-                                        audio = recognizer.listen(source)
-                                        text = recognizer.recognize_google(audio)
-                                        if text:
-                                            st.session_state["training_voice_input"] += " " + text
-                                            st.write(f"You said: {st.session_state['training_voice_input']}")
-                                    except sr.UnknownValueError:
-                                        st.warning("Could not understand audio.")
-                                    except sr.RequestError:
-                                        st.warning("Speech recognition service error.")
-                                    except Exception as e:
-                                        st.error(f"Error: {str(e)}")
+                                try:
+                                    while st.session_state["training_listening"]:
+                                        try:
+                                            audio = recognizer.listen(source)
+                                            calibrator.observe()
+                                            text = recognizer.recognize_google(audio)
+                                            if text:
+                                                voice_input.append(text)
+                                                st.session_state["training_speculative"].update(voice_input, voice_input.word_count)
+                                                st.write(f"You said: {text}")
+                                        except sr.UnknownValueError:
+                                            st.warning("Could not understand audio.")
+                                        except sr.RequestError:
+                                            st.warning("Speech recognition service error.")
+                                        except Exception as e:
+                                            st.error(f"Error: {str(e)}")
+                                finally:
+                                    calibrator.flush()
                         except OSError as e:
                             st.error(f"Error accessing microphone: {e}. Please check permissions or device connection.")
                         except Exception as e:
@@ -141,7 +138,7 @@ def main():
                     if st.button("Stop Voice Input", key="training_stop_voice_input"):
                         st.session_state["training_listening"] = False
                         st.success("Voice input stopped.")
-                user_input = st.session_state["training_voice_input"]
+                user_input = voice_input.text
 
             elif input_method == "Upload Audio File":
                 uploaded_file = st.file_uploader("Upload Audio File", type=["wav", "mp3", "flac"], key="training_audio_upload")
@@ -167,35 +164,25 @@ def main():
                     finally:
                         os.unlink(temp_file_path)
 
+            reevaluate = st.checkbox("Re-evaluate similar responses", key="training_reevaluate")
             if st.button("Evaluate Response"):
                 if user_input:
                     try:
-                        model = genai.GenerativeModel("gemini-1.5-pro")
-                        feedback = model.generate_content(f"""Analyze the following response and provide structured feedback (clarity, tone, engagement scores out of 10) on its clarity, structure, engagement, and effectiveness:\n\n{user_input}""")
-                        feedback_text = str(feedback.candidates[0].content)
-
-                        # Structured Feedback with Scores
-                        scores = extract_scores(feedback_text)
-                        structured_feedback = f"""
-    **Feedback:**
-
-    **Clarity Score:** {scores['clarity']} / 10
-    **Tone Score:** {scores['tone']} / 10
-    **Engagement Score:** {scores['engagement']} / 10
-
-    **Strengths:**
-    {get_strengths(feedback_text)}
-
-    **Areas for Improvement:**
-    {get_improvements(feedback_text)}
-
-    **Overall:**
-    {get_overall(feedback_text)}
-                        """
-
-                        st.markdown(structured_feedback)
-                        speak_text(feedback_text)
-                        save_progress(user_input, feedback_text)
+                        with profile_section("evaluation"):
+                            similar = None if reevaluate else find_similar_feedback(user_input, module, topic)
+                            if similar is not None:
+                                show_similar_notice(similar)
+                                feedback_text = similar["feedback"]
+                            elif input_method == "Voice Input":
+                                feedback_text = st.session_state["training_speculative"].finalize(user_input)
+                            else:
+                                feedback_text = generate_feedback(build_prompt(user_input, module), model)
+
+                            # Structured Feedback with Scores
+                            st.markdown(format_feedback(parse_feedback(feedback_text)))
+                            speak_in_background(speak_text, feedback_text)
+                            if similar is None:
+                                pending_saves.append(run_in_background(save_progress, user_input, feedback_text, module=module, topic=topic))
                     except Exception as e:
                         st.error(f"Error generating feedback: {str(e)}")
                 else:
@@ -210,10 +197,11 @@ def main():
             user_input = st.text_area("Enter your message:", placeholder="Example: I often struggle with filler words like 'um' and 'uh'. How can I improve?", key="general_text_input")
 
         elif input_method == "Voice Input":
-            if "general_voice_input" not in st.session_state:
-                st.session_state["general_voice_input"] = ""
+            voice_input = session.transcript("general")
             if "general_listening" not in st.session_state:
                 st.session_state["general_listening"] = False
+            if "general_speculative" not in st.session_state or st.session_state["general_speculative"].module != module:
+                st.session_state["general_speculative"] = SpeculativeEvaluator(module, model)
 
             col1, col2 = st.columns([1, 1])
             with col1:
@@ -221,21 +209,26 @@ def main():
                     st.session_state["general_listening"] = True
                     try:
                         with sr.Microphone() as source:
-                            recognizer.adjust_for_ambient_noise(source, duration=1)
+                            calibrator.prepare(source)
                             st.info("Listening... Press 'Stop Voice Input' to end.")
-                            while st.session_state["general_listening"]:
-                                try:
-                                    audio = recognizer.listen(source)
-                                    text = recognizer.recognize_google(audio)
-                                    if text:
-                                        st.session_state["general_voice_input"] += " " + text
-                                        st.write(f"You said: {st.session_state['general_voice_input']}")
-                                except sr.UnknownValueError:
-                                    st.warning("Could not understand audio.")
-                                except sr.RequestError:
-                                    st.warning("Speech recognition service error.")
-                                except Exception as e:
-                                    st.error(f"Error: {str(e)}")
+                            try:
+                                while st.session_state["general_listening"]:
+                                    try:
+                                        audio = recognizer.listen(source)
+                                        calibrator.observe()
+                                        text = recognizer.recognize_google(audio)
+                                        if text:
+                                            voice_input.append(text)
+                                            st.session_state["general_speculative"].update(voice_input, voice_input.word_count)
+                                            st.write(f"You said: {text}")
+                                    except sr.UnknownValueError:
+                                        st.warning("Could not understand audio.")
+                                    except sr.RequestError:
+                                        st.warning("Speech recognition service error.")
+                                    except Exception as e:
+                                        st.error(f"Error: {str(e)}")
+                            finally:
+                                calibrator.flush()
                     except OSError as e:
                         st.error(f"Error accessing microphone: {e}. Please check permissions or device connection.")
                     except Exception as e:
@@ -244,7 +237,7 @@ def main():
                     if st.button("Stop Voice Input", key="general_stop_voice_input"):
                         st.session_state["general_listening"] = False
                         st.success("Voice input stopped.")
-                user_input = st.session_state["general_voice_input"]
+                user_input = voice_input.text
 
         elif input_method == "Upload Audio File":
             uploaded_file = st.file_uploader("Upload Audio File", type=["wav", "mp3", "flac"], key="general_audio_upload")
@@ -270,100 +263,62 @@ def main():
                 finally:
                     os.unlink(temp_file_path)
 
+        reevaluate = st.checkbox("Re-evaluate similar responses", key="general_reevaluate")
         if st.button("Get AI Feedback", key="general_feedback_button"):
             if user_input:
                 try:
-                    model = genai.GenerativeModel("gemini-1.5-pro")
-                    feedback = model.generate_content(f"Provide structured feedback (clarity, tone, engagement scores out of 10) on my verbal clarity: {user_input}")
-                    feedback_text = str(feedback.candidates[0].content)
-
-                    # Structured Feedback with Scores
-                    scores = extract_scores(feedback_text)
-                    structured_feedback = f"""
-    **Feedback:**
-
-    **Clarity Score:** {scores['clarity']} / 10
-    **Tone Score:** {scores['tone']} / 10
-    **Engagement Score:** {scores['engagement']} / 10
-
-    **Strengths:**
-    {get_strengths(feedback_text)}
+                    with profile_section("evaluation"):
+                        similar = None if reevaluate else find_similar_feedback(user_input, module)
+                        if similar is not None:
+                            show_similar_notice(similar)
+                            feedback_text = similar["feedback"]
+                        elif input_method == "Voice Input":
+                            feedback_text = st.session_state["general_speculative"].finalize(user_input)
+                        else:
+                            feedback_text = generate_feedback(build_prompt(user_input, module), model)
 
-    **Areas for Improvement:**
-    {get_improvements(feedback_text)}
-
-    **Overall:**
-    {get_overall(feedback_text)}
-                    """
-
-                    st.markdown(structured_feedback)
-                    speak_text(feedback_text)
-                    save_progress(user_input, feedback_text)
+                        # Structured Feedback with Scores
+                        st.markdown(format_feedback(parse_feedback(feedback_text)))
+                        speak_in_background(speak_text, feedback_text)
+                        if similar is None:
+                            pending_saves.append(run_in_background(save_progress, user_input, feedback_text, module=module))
                 except Exception as e:
                     st.error(f"Error generating AI feedback: {str(e)}")
             else:
                 st.warning("Please provide input to get feedback.")
 
+    with st.sidebar.expander("Session Memory"):
+        st.json(session.report())
+
     # Show progress history at the end
+    for future in pending_saves:
+        if future.exception() is not None:
+            st.error("Failed to save progress.")
     st.subheader("Progress History")
     st.text_area("Recorded Progress:", load_progress(), height=200, key="progress_history")
 
-def extract_scores(feedback_text):
-    scores = {"clarity": "N/A", "tone": "N/A", "engagement": "N/A"}
-    lines = feedback_text.split('\n')
-    for line in lines:
-        line_lower = line.lower()
-        if "clarity score" in line_lower:
-            try:
-                score_str = line_lower.split("clarity score:")[1].split("/")[0].strip()
-                scores["clarity"] = int(score_str)
-            except (ValueError, IndexError):
-                print(f"Error parsing clarity score from: {line}")
-        elif "tone score" in line_lower:
-            try:
-                score_str = line_lower.split("tone score:")[1].split("/")[0].strip()
-                scores["tone"] = int(score_str)
-            except (ValueError, IndexError):
-                print(f"Error parsing tone score from: {line}")
-        elif "engagement score" in line_lower:
-            try:
-                score_str = line_lower.split("engagement score:")[1].split("/")[0].strip()
-                scores["engagement"] = int(score_str)
-            except (ValueError, IndexError):
-                print(f"Error parsing engagement score from: {line}")
-    return scores
-def get_strengths(feedback_text):
-    strengths = []
-    lines = feedback_text.split('\n')
-    for line in lines:
-        if "strength" in line.lower() or "positive" in line.lower() or "good" in line.lower() or "well" in line.lower():
-            if ":" in line:
-                strength = line.split(":", 1)[1].strip()
-                if strength:
-                    strengths.append(f"- {strength}")
-    return "\n".join(strengths) if strengths else "- No specific strengths identified."
-
-def get_improvements(feedback_text):
-    improvements = []
-    lines = feedback_text.split('\n')
-    for line in lines:
-        if "improve" in line.lower() or "area" in line.lower() or "suggestion" in line.lower() or "could" in line.lower() or "consider" in line.lower():
-            if ":" in line:
-                improvement = line.split(":", 1)[1].strip()
-                if improvement:
-                    improvements.append(f"- {improvement}")
-    return "\n".join(improvements) if improvements else "- No specific areas for improvement identified."
-
-def get_overall(feedback_text):
-    overall = []
-    lines = feedback_text.split('\n')
-    for line in lines:
-        if "overall" in line.lower() or "summary" in line.lower() or "conclusion" in line.lower():
-            if ":" in line:
-                overall_text = line.split(":", 1)[1].strip()
-                if overall_text:
-                    overall.append(f"{overall_text}")
-    return "\n".join(overall) if overall else "No overall summary provided."
+    # Search past responses and feedback
+    query = st.text_input("Search past responses:", placeholder="Example: conflict resolution with deadlines", key="progress_search")
+    if query:
+        col1, col2, col3 = st.columns([2, 1, 1])
+        with col1:
+            search_module = st.selectbox("Module:", ["All Modules"] + MODULES, key="progress_search_module")
+        with col2:
+            date_from = st.date_input("From:", value=None, key="progress_search_from")
+        with col3:
+            date_to = st.date_input("To:", value=None, key="progress_search_to")
+        results = search_progress(
+            query,
+            module=None if search_module == "All Modules" else search_module,
+            date_from=date_from.isoformat() if date_from else None,
+            date_to=date_to.isoformat() if date_to else None,
+        )
+        if results:
+            for entry in results:
+                st.markdown(f"**{entry.get('timestamp', 'Unknown date')} · {entry.get('module', 'Unknown module')}**\n\n"
+                            f"**User Input:**\n{entry['user_input']}\n\n**AI Feedback:**\n{entry['feedback']}\n\n{'-'*40}")
+        else:
+            st.write("No matching responses found.")
 
 # Unit/Integration Tests
 class TestVerbalTrainer(unittest.TestCase):
@@ -422,6 +377,14 @@ class TestVerbalTrainer(unittest.TestCase):
         overall = get_overall(feedback_text)
         self.assertEqual(overall, "No overall summary provided.")
 
+def show_profile_summary(summary):
+    with st.sidebar.expander("Profile (this rerun)"):
+        st.caption(f"Saved to {summary['path']}")
+        st.text(format_summary(summary))
+
 if __name__ == "__main__":
-    main()
+    with profile_section("rerun", force=profiling_requested()) as rerun_profile:
+        main()
+    if rerun_profile is not None:
+        show_profile_summary(rerun_profile.summary)
     unittest.main(argv=['first-arg-is-ignored'], exit=False)
@@ -0,0 +1,289 @@
+import os
+import re
+import time
+import random
+import hashlib
+from datetime import datetime
+
+from progress_store import get_store
+from progress_search import get_index
+import near_duplicate
+from profiling import profile_section
+
+# Optional dependencies: the headless service can run in fake-Gemini mode
+# without the Google SDKs installed.
+try:
+    import google.generativeai as genai
+except ImportError:
+    genai = None
+try:
+    import speech_recognition as sr
+except ImportError:
+    sr = None
+
+API_KEY_DOCX = "/home/harsha/Downloads/Gemini -API.docx"
+MODEL_NAME = "gemini-1.5-pro"
+PROGRESS_FILE = "progress.json"
+PROGRESS_DISPLAY_LIMIT = 50
+GENERAL_MODULE = "General Feedback"
+MODULES = ["Impromptu Speaking", "Storytelling", "Conflict Resolution", GENERAL_MODULE]
+
+# Load API Key from docx file
+def read_api_key(docx_path=API_KEY_DOCX):
+    import docx
+    doc = docx.Document(docx_path)
+    return doc.paragraphs[0].text.strip()
+
+def configure_gemini(api_key=None):
+    api_key = api_key or os.environ.get("GEMINI_API_KEY") or read_api_key()
+    if genai is None:
+        raise RuntimeError("google-generativeai is not installed.")
+    genai.configure(api_key=api_key)
+
+# Stand-in for genai.GenerativeModel used for local testing
+class FakeGenerativeModel:
+
+    def __init__(self, model_name=MODEL_NAME, latency=0.0, error_rate=0.0):
+        self.model_name = model_name
+        self.latency = latency
+        self.error_rate = error_rate
+
+    def generate_content(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            raise RuntimeError("Fake Gemini error")
+        items = split_batch_response(prompt)
+        if items:
+            return TextResponse(build_batch_response([fake_feedback(item) for item in items]))
+        return TextResponse(fake_feedback(prompt))
+
+# Minimal response object shaped like the one generate_content returns
+class TextResponse:
+
+    def __init__(self, text):
+        self.text = text
+        self.candidates = [TextCandidate(text)]
+
+class TextCandidate:
+
+    def __init__(self, text):
+        self.content = text
+
+def fake_feedback(prompt):
+    digest = hashlib.sha1(prompt.encode("utf-8")).digest()
+    clarity, tone, engagement = (5 + b % 6 for b in digest[:3])
+    return (
+        f"Clarity Score: {clarity}/10\n"
+        f"Tone Score: {tone}/10\n"
+        f"Engagement Score: {engagement}/10\n"
+        f"Strength: Good structure and a clear main point.\n"
+        f"Improve: Consider adding a concrete example.\n"
+        f"Overall: A solid response with room to grow."
+    )
+
+def get_model(fake=False, model_name=MODEL_NAME):
+    if fake:
+        return FakeGenerativeModel(model_name)
+    if genai is None:
+        raise RuntimeError("google-generativeai is not installed.")
+    return genai.GenerativeModel(model_name)
+
+def build_prompt(user_input, module=GENERAL_MODULE):
+    if module == GENERAL_MODULE:
+        return f"Provide structured feedback (clarity, tone, engagement scores out of 10) on my verbal clarity: {user_input}"
+    return f"""Analyze the following response and provide structured feedback (clarity, tone, engagement scores out of 10) on its clarity, structure, engagement, and effectiveness:\n\n{user_input}"""
+
+# Free-form prompts used by the AI_Integration_1 coach
+def build_chat_prompt(user_input):
+    return f"You are a communication coach. Provide detailed and constructive feedback on: {user_input}"
+
+def build_voice_prompt(text):
+    return f"Analyze this speech in detail, providing feedback on clarity, pronunciation, and confidence: {text}"
+
+# Several prompts sent as one request, each answer under its own marker line
+BATCH_ITEM_RE = re.compile(r"^=== ITEM (\d+) ===[ \t]*$", re.MULTILINE)
+
+def build_batch_response(answers):
+    return "\n\n".join(f"=== ITEM {number} ===\n{answer}" for number, answer in enumerate(answers, 1))
+
+def build_batch_prompt(prompts):
+    return (f"You will handle {len(prompts)} independent requests. Answer each one separately and in order. "
+            f"Start each answer with a line containing only '=== ITEM <number> ===', using the request's number, "
+            f"and do not refer to the other requests.\n\n" + build_batch_response(prompts))
+
+def split_batch_response(text, count=None):
+    markers = list(BATCH_ITEM_RE.finditer(text))
+    if not markers or (count is not None and len(markers) != count):
+        return None
+    items = []
+    for number, marker in enumerate(markers, 1):
+        if int(marker.group(1)) != number:
+            return None
+        end = markers[number].start() if number < len(markers) else len(text)
+        items.append(text[marker.end():end].strip())
+    return items
+
+def generate_feedback(prompt, model=None):
+    model = model or get_model()
+    # .text is what batched answers are split from, so every path matches
+    return model.generate_content(prompt).text
+
+def transcribe_audio_file(path, recognizer=None):
+    if sr is None:
+        raise RuntimeError("SpeechRecognition is not installed.")
+    recognizer = recognizer or sr.Recognizer()
+    with sr.AudioFile(path) as source:
+        audio_data = recognizer.record(source)
+    return recognizer.recognize_google(audio_data)
+
+def extract_scores(feedback_text):
+    scores = {"clarity": "N/A", "tone": "N/A", "engagement": "N/A"}
+    lines = feedback_text.split('\n')
+    for line in lines:
+        line_lower = line.lower()
+        if "clarity score" in line_lower:
+            try:
+                score_str = line_lower.split("clarity score:")[1].split("/")[0].strip()
+                scores["clarity"] = int(score_str)
+            except (ValueError, IndexError):
+                print(f"Error parsing clarity score from: {line}")
+        elif "tone score" in line_lower:
+            try:
+                score_str = line_lower.split("tone score:")[1].split("/")[0].strip()
+                scores["tone"] = int(score_str)
+            except (ValueError, IndexError):
+                print(f"Error parsing tone score from: {line}")
+        elif "engagement score" in line_lower:
+            try:
+                score_str = line_lower.split("engagement score:")[1].split("/")[0].strip()
+                scores["engagement"] = int(score_str)
+            except (ValueError, IndexError):
+                print(f"Error parsing engagement score from: {line}")
+    return scores
+
+def get_strengths(feedback_text):
+    strengths = []
+    lines = feedback_text.split('\n')
+    for line in lines:
+        if "strength" in line.lower() or "positive" in line.lower() or "good" in line.lower() or "well" in line.lower():
+            if ":" in line:
+                strength = line.split(":", 1)[1].strip()
+                if strength:
+                    strengths.append(f"- {strength}")
+    return "\n".join(strengths) if strengths else "- No specific strengths identified."
+
+def get_improvements(feedback_text):
+    improvements = []
+    lines = feedback_text.split('\n')
+    for line in lines:
+        if "improve" in line.lower() or "area" in line.lower() or "suggestion" in line.lower() or "could" in line.lower() or "consider" in line.lower():
+            if ":" in line:
+                improvement = line.split(":", 1)[1].strip()
+                if improvement:
+                    improvements.append(f"- {improvement}")
+    return "\n".join(improvements) if improvements else "- No specific areas for improvement identified."
+
+def get_overall(feedback_text):
+    overall = []
+    lines = feedback_text.split('\n')
+    for line in lines:
+        if "overall" in line.lower() or "summary" in line.lower() or "conclusion" in line.lower():
+            if ":" in line:
+                overall_text = line.split(":", 1)[1].strip()
+                if overall_text:
+                    overall.append(f"{overall_text}")
+    return "\n".join(overall) if overall else "No overall summary provided."
+
+def parse_feedback(feedback_text):
+    return {
+        "scores": extract_scores(feedback_text),
+        "strengths": get_strengths(feedback_text),
+        "improvements": get_improvements(feedback_text),
+        "overall": get_overall(feedback_text),
+    }
+
+def format_feedback(parsed):
+    scores = parsed["scores"]
+    return f"""
+**Feedback:**
+
+**Clarity Score:** {scores['clarity']} / 10
+**Tone Score:** {scores['tone']} / 10
+**Engagement Score:** {scores['engagement']} / 10
+
+**Strengths:**
+{parsed['strengths']}
+
+**Areas for Improvement:**
+{parsed['improvements']}
+
+**Overall:**
+{parsed['overall']}
+"""
+
+# User Progress Tracking
+def save_progress(user_input, feedback, progress_file=PROGRESS_FILE, **extra):
+    entry = {"user_input": user_input, "feedback": feedback,
+             "timestamp": datetime.now().isoformat(timespec="seconds")}
+    entry.update(extra)
+    doc_id = get_store(progress_file).append(entry)
+    get_index(progress_file).add(doc_id, entry)
+    near_duplicate.get_index(progress_file).add(doc_id, entry)
+    return entry
+
+def load_progress_entries(progress_file=PROGRESS_FILE, limit=None):
+    store = get_store(progress_file)
+    if limit is None:
+        return list(store.entries())
+    return store.recent(limit)
+
+def load_progress(progress_file=PROGRESS_FILE, limit=PROGRESS_DISPLAY_LIMIT):
+    data, total = get_store(progress_file).recent_with_total(limit)
+    if data:
+        older = total - len(data)
+        history = "\n\n".join([
+            f"**User Input:**\n{entry['user_input']}\n\n**AI Feedback:**\n{entry['feedback']}\n{'-'*40}"
+            for entry in data
+        ])
+        return f"({older} older entries not shown)\n\n{history}" if older else history
+    return "No progress recorded yet."
+
+def search_progress(query, module=None, date_from=None, date_to=None, limit=10, progress_file=PROGRESS_FILE):
+    hits = get_index(progress_file).search(query, module, date_from, date_to, limit)
+    entries = get_store(progress_file).get_many([doc_id for doc_id, _ in hits])
+    return [dict(entry, score=round(score, 3)) for entry, (_, score) in zip(entries, hits)]
+
+# Earlier entry for the same module and topic whose input is a near-duplicate
+def find_similar_feedback(user_input, module=None, topic=None, threshold=near_duplicate.DUPLICATE_THRESHOLD,
+                          progress_file=PROGRESS_FILE):
+    match = near_duplicate.get_index(progress_file).find(user_input, module, topic, threshold)
+    if match is None:
+        return None
+    entry = dict(get_store(progress_file).get(match[0]))
+    entry["similarity"] = round(match[1], 3)
+    return entry
+
+# Full pipeline: prompt -> Gemini -> parse -> persist
+def evaluate(user_input, module=GENERAL_MODULE, model=None, progress_file=PROGRESS_FILE, persist=True,
+             reuse_similar=False, topic=None):
+    if not user_input or not user_input.strip():
+        raise ValueError("Please provide input to get feedback.")
+    with profile_section("evaluation"):
+        similar = find_similar_feedback(user_input, module, topic, progress_file=progress_file) if reuse_similar else None
+        if similar is not None:
+            feedback_text = similar["feedback"]
+        else:
+            feedback_text = generate_feedback(build_prompt(user_input, module), model)
+        parsed = parse_feedback(feedback_text)
+        if persist and similar is None:
+            extra = {"topic": topic} if topic else {}
+            save_progress(user_input, feedback_text, progress_file, module=module, **extra)
+    result = {"user_input": user_input, "module": module, "feedback": feedback_text}
+    if topic:
+        result["topic"] = topic
+    if similar is not None:
+        result["reused_from"] = {"timestamp": similar.get("timestamp"), "similarity": similar["similarity"]}
+    result.update(parsed)
+    result["structured_feedback"] = format_feedback(parsed)
+    return result
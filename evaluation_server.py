@@ -0,0 +1,425 @@
+import os
+import json
+import asyncio
+import argparse
+import tempfile
+import unittest
+import unittest.mock
+import email.parser
+import email.policy
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+import evaluation
+from micro_batch import MicroBatcher, MAX_BATCH
+
+MAX_BODY_SIZE = 10 * 1024 * 1024
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 422: "Unprocessable Entity", 429: "Too Many Requests",
+           500: "Internal Server Error", 502: "Bad Gateway"}
+
+class HTTPError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+# Headless evaluation service: requests are queued for a fixed pool of workers
+# and rejected with 429 once the queue is full.
+class EvaluationServer:
+
+    def __init__(self, workers=4, queue_size=32, fake_gemini=False, progress_file=evaluation.PROGRESS_FILE,
+                 batch_window=0.0, max_batch=MAX_BATCH):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.fake_gemini = fake_gemini
+        self.progress_file = progress_file
+        self.model = evaluation.get_model(fake=fake_gemini)
+        # Batches form from requests that workers are evaluating concurrently
+        self.batcher = None
+        if batch_window > 0:
+            self.batcher = MicroBatcher(self.model, batch_window, min(max_batch, workers),
+                                        validate=has_scores)
+        self.queue = None
+        self.executor = None
+        self.server = None
+        self.tasks = []
+
+    async def start(self, host="127.0.0.1", port=8000):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.executor.shutdown(wait=False)
+        if self.batcher is not None:
+            self.batcher.close()
+
+    async def worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job, future = await self.queue.get()
+            try:
+                result = await loop.run_in_executor(self.executor, job)
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    async def submit(self, job):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((job, future))
+        except asyncio.QueueFull:
+            raise HTTPError(429, "Server is busy, please retry later.")
+        return await future
+
+    async def handle_connection(self, reader, writer):
+        try:
+            method, path, headers, body = await read_request(reader)
+            status, payload = await self.route(method, path, headers, body)
+        except HTTPError as e:
+            status, payload = e.status, {"error": e.message}
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        except Exception as e:
+            status, payload = 500, {"error": f"Error generating feedback: {str(e)}"}
+        await write_response(writer, status, payload)
+
+    async def route(self, method, path, headers, body):
+        path, _, query = path.partition("?")
+        if path == "/health":
+            if method != "GET":
+                raise HTTPError(405, "Use GET.")
+            health = {"status": "ok", "queued": self.queue.qsize(), "workers": self.workers,
+                      "fake_gemini": self.fake_gemini}
+            if self.batcher is not None:
+                health["batching"] = dict(self.batcher.stats)
+            return 200, health
+        if path == "/evaluate":
+            if method != "POST":
+                raise HTTPError(405, "Use POST.")
+            try:
+                data = json.loads(body or b"{}")
+            except json.JSONDecodeError:
+                raise HTTPError(400, "Request body must be JSON.")
+            user_input, module, topic = parse_evaluation_fields(data)
+            reuse_similar = data.get("reuse_similar", False)
+            if not isinstance(reuse_similar, bool):
+                raise HTTPError(400, "'reuse_similar' must be true or false.")
+            return 200, await self.submit(lambda: self.evaluate(user_input, module, reuse_similar, topic))
+        if path == "/evaluate/audio":
+            if method != "POST":
+                raise HTTPError(405, "Use POST.")
+            fields, files = parse_multipart(headers.get("content-type", ""), body)
+            if "audio" not in files:
+                raise HTTPError(400, "Missing 'audio' file field.")
+            module = fields.get("module", evaluation.GENERAL_MODULE)
+            if module not in evaluation.MODULES:
+                raise HTTPError(400, f"Unknown module: {module}")
+            audio = files["audio"]
+            topic = fields.get("topic") or None
+            return 200, await self.submit(lambda: self.evaluate_audio(audio, module, topic))
+        if path == "/search":
+            if method != "GET":
+                raise HTTPError(405, "Use GET.")
+            params = {key: values[0] for key, values in urllib.parse.parse_qs(query).items()}
+            if not params.get("q"):
+                raise HTTPError(400, "Missing 'q' query parameter.")
+            try:
+                limit = int(params.get("limit", 10))
+            except ValueError:
+                raise HTTPError(400, "'limit' must be an integer.")
+            # The first search loads the index; neither may block the event loop
+            results = await asyncio.get_running_loop().run_in_executor(
+                None, evaluation.search_progress, params["q"], params.get("module"), params.get("from"),
+                params.get("to"), limit, self.progress_file)
+            return 200, {"results": results}
+        raise HTTPError(404, f"No route for {path}")
+
+    def evaluate(self, user_input, module, reuse_similar=False, topic=None):
+        return evaluation.evaluate(user_input, module, model=self.batcher or self.model,
+                                   progress_file=self.progress_file, reuse_similar=reuse_similar, topic=topic)
+
+    def evaluate_audio(self, audio, module, topic=None):
+        with tempfile.NamedTemporaryFile(delete=False) as temp_audio:
+            temp_audio.write(audio)
+            temp_file_path = temp_audio.name
+        try:
+            user_input = evaluation.transcribe_audio_file(temp_file_path)
+        except Exception as e:
+            error = audio_error(e)
+            if error is None:
+                raise
+            raise error from e
+        finally:
+            os.unlink(temp_file_path)
+        if not user_input.strip():
+            raise HTTPError(422, "Speech recognition could not understand audio")
+        return self.evaluate(user_input, module, topic=topic)
+
+# Same messages the Streamlit upload flow shows
+def audio_error(error):
+    sr = evaluation.sr
+    if sr is not None and isinstance(error, sr.UnknownValueError):
+        return HTTPError(422, "Speech recognition could not understand audio")
+    if sr is not None and isinstance(error, sr.RequestError):
+        return HTTPError(502, f"Could not request results from Google Speech Recognition service; {error}")
+    # sr.AudioFile rejects formats it cannot decode with ValueError
+    if isinstance(error, ValueError):
+        return HTTPError(400, "Audio file could not be read; upload WAV, AIFF or FLAC audio.")
+    return None
+
+def has_scores(feedback_text):
+    return any(score != "N/A" for score in evaluation.extract_scores(feedback_text).values())
+
+def parse_evaluation_fields(data):
+    if not isinstance(data, dict):
+        raise HTTPError(400, "Request body must be a JSON object.")
+    user_input = data.get("user_input", "")
+    module = data.get("module", evaluation.GENERAL_MODULE)
+    if not isinstance(user_input, str) or not user_input.strip():
+        raise HTTPError(400, "Please provide input to get feedback.")
+    if module not in evaluation.MODULES:
+        raise HTTPError(400, f"Unknown module: {module}")
+    topic = data.get("topic")
+    if topic is not None and not isinstance(topic, str):
+        raise HTTPError(400, "'topic' must be a string.")
+    return user_input, module, topic or None
+
+def parse_multipart(content_type, body):
+    if not content_type.startswith("multipart/form-data"):
+        raise HTTPError(400, "Expected multipart/form-data.")
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body)
+    fields, files = {}, {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        if not name:
+            continue
+        payload = part.get_payload(decode=True) or b""
+        if part.get_filename() is not None:
+            files[name] = payload
+        else:
+            fields[name] = payload.decode("utf-8")
+    return fields, files
+
+async def read_request(reader):
+    request_line = (await reader.readuntil(b"\r\n")).decode("latin-1").strip()
+    try:
+        method, path, _ = request_line.split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line.")
+    headers = {}
+    while True:
+        line = (await reader.readuntil(b"\r\n")).decode("latin-1").strip()
+        if not line:
+            break
+        key, _, value = line.partition(":")
+        headers[key.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        raise HTTPError(400, "Content-Length must be an integer.")
+    if length < 0:
+        raise HTTPError(400, "Content-Length must not be negative.")
+    if length > MAX_BODY_SIZE:
+        raise HTTPError(413, "Request body too large.")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, headers, body
+
+async def write_response(writer, status, payload):
+    body = json.dumps(payload).encode("utf-8")
+    head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            "Connection: close"]
+    if status == 429:
+        head.append("Retry-After: 1")
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    try:
+        await writer.drain()
+    finally:
+        writer.close()
+
+async def serve(args):
+    if not args.fake_gemini:
+        evaluation.configure_gemini()
+    server = EvaluationServer(args.workers, args.queue_size, args.fake_gemini, args.progress_file,
+                              args.batch_window / 1000, args.max_batch)
+    port = await server.start(args.host, args.port)
+    print(f"Evaluation API listening on http://{args.host}:{port}")
+    async with server.server:
+        await server.server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless HTTP API for the Verbal Communication Skills Trainer.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=32)
+    parser.add_argument("--progress-file", default=evaluation.PROGRESS_FILE)
+    parser.add_argument("--batch-window", type=float, default=0.0,
+                        help="Milliseconds to collect requests into one Gemini call; 0 disables batching.")
+    parser.add_argument("--max-batch", type=int,
+                        help=f"Largest number of requests per batch (default {MAX_BATCH}). Batches form from requests "
+                             "workers are evaluating at once, so this is capped at --workers.")
+    parser.add_argument("--fake-gemini", action="store_true",
+                        default=os.environ.get("VERBAL_TRAINER_FAKE_GEMINI") == "1")
+    args = parser.parse_args()
+    if args.max_batch is None:
+        args.max_batch = MAX_BATCH
+    elif args.max_batch > args.workers:
+        print(f"Warning: --max-batch {args.max_batch} is larger than --workers {args.workers}; "
+              f"batches will hold at most {args.workers} requests.")
+    asyncio.run(serve(args))
+
+# Unit/Integration Tests
+class TestEvaluationServer(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        progress_file = os.path.join(self.tmpdir.name, "progress.json")
+        self.server = EvaluationServer(workers=1, queue_size=1, fake_gemini=True, progress_file=progress_file)
+        self.port = await self.server.start(port=0)
+
+    async def asyncTearDown(self):
+        await self.server.stop()
+        self.tmpdir.cleanup()
+
+    async def request(self, method, path, body=b"", content_type="application/json"):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+        raw = await reader.read()
+        writer.close()
+        head, _, payload = raw.partition(b"\r\n\r\n")
+        return int(head.split(b" ")[1]), json.loads(payload)
+
+    async def test_evaluate_json(self):
+        body = json.dumps({"user_input": "Teamwork matters.", "module": "Storytelling"}).encode()
+        status, payload = await self.request("POST", "/evaluate", body)
+        self.assertEqual(status, 200)
+        self.assertIsInstance(payload["scores"]["clarity"], int)
+        entries = evaluation.load_progress_entries(self.server.progress_file)
+        self.assertEqual(entries[0]["module"], "Storytelling")
+
+    async def test_search_finds_saved_response(self):
+        body = json.dumps({"user_input": "Resolving conflict over deadlines.", "module": "Conflict Resolution"}).encode()
+        await self.request("POST", "/evaluate", body)
+        status, payload = await self.request("GET", "/search?q=deadline&module=Conflict+Resolution")
+        self.assertEqual(status, 200)
+        self.assertEqual(payload["results"][0]["user_input"], "Resolving conflict over deadlines.")
+
+    async def test_reuses_feedback_for_near_duplicate(self):
+        answer = "Teamwork is essential because it allows people to collaborate, share ideas, and solve problems."
+        await self.request("POST", "/evaluate", json.dumps({"user_input": answer}).encode())
+        retry = json.dumps({"user_input": "Um " + answer, "reuse_similar": True}).encode()
+        status, payload = await self.request("POST", "/evaluate", retry)
+        self.assertEqual(status, 200)
+        self.assertIn("reused_from", payload)
+        self.assertEqual(len(evaluation.load_progress_entries(self.server.progress_file)), 1)
+
+    async def test_reuse_after_history_reset(self):
+        answer = "Teamwork is essential because it allows people to collaborate, share ideas, and solve problems."
+        evaluation.save_progress("First answer.", "ok", self.server.progress_file)
+        evaluation.save_progress(answer, "Clarity Score: 8/10", self.server.progress_file)
+        os.remove(self.server.progress_file)
+        retry = json.dumps({"user_input": "Um " + answer, "reuse_similar": True}).encode()
+        status, payload = await self.request("POST", "/evaluate", retry)
+        self.assertEqual(status, 200)
+        self.assertNotIn("reused_from", payload)
+        status, payload = await self.request("POST", "/evaluate", retry)
+        self.assertEqual(payload["reused_from"]["similarity"], 1.0)
+
+    async def test_reuse_is_scoped_by_topic(self):
+        answer = "I understand deadlines are hard, but missing them affects the whole team and our plans."
+        topic = "Respond to: 'I'm upset because you missed a deadline.'"
+        # Saved the way the Streamlit training module saves it
+        evaluation.save_progress(answer, "Clarity Score: 8/10", self.server.progress_file,
+                                 module="Conflict Resolution", topic=topic)
+        request = {"user_input": answer, "module": "Conflict Resolution", "reuse_similar": True}
+        status, payload = await self.request("POST", "/evaluate", json.dumps(dict(request, topic=topic)).encode())
+        self.assertEqual(status, 200)
+        self.assertIn("reused_from", payload)
+        status, payload = await self.request("POST", "/evaluate", json.dumps(request).encode())
+        self.assertNotIn("reused_from", payload)
+
+    async def test_reuse_similar_must_be_boolean(self):
+        body = json.dumps({"user_input": "Teamwork matters.", "reuse_similar": "false"}).encode()
+        status, payload = await self.request("POST", "/evaluate", body)
+        self.assertEqual(status, 400)
+
+    async def test_evaluate_rejects_empty_input(self):
+        status, payload = await self.request("POST", "/evaluate", b'{"user_input": ""}')
+        self.assertEqual(status, 400)
+
+    async def test_overload_returns_429(self):
+        self.server.model.latency = 0.2
+        body = json.dumps({"user_input": "Hello there."}).encode()
+        results = await asyncio.gather(*(self.request("POST", "/evaluate", body) for _ in range(5)))
+        statuses = [status for status, _ in results]
+        self.assertIn(200, statuses)
+        self.assertIn(429, statuses)
+
+    async def test_batched_evaluations(self):
+        await self.server.stop()
+        self.server = EvaluationServer(workers=4, queue_size=8, fake_gemini=True,
+                                       progress_file=self.server.progress_file, batch_window=0.2)
+        self.port = await self.server.start(port=0)
+        bodies = [json.dumps({"user_input": f"Answer {i}."}).encode() for i in range(4)]
+        results = await asyncio.gather(*(self.request("POST", "/evaluate", body) for body in bodies))
+        self.assertEqual([status for status, _ in results], [200] * 4)
+        self.assertEqual(self.server.batcher.stats["batched_items"], 4)
+
+    async def test_malformed_content_length_is_400(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        writer.write(b"POST /evaluate HTTP/1.1\r\nHost: test\r\nContent-Length: ten\r\n\r\n")
+        await writer.drain()
+        raw = await reader.read()
+        writer.close()
+        self.assertTrue(raw.startswith(b"HTTP/1.1 400 "))
+
+    async def test_unintelligible_audio_is_422(self):
+        class FakeSpeechRecognition:
+            class UnknownValueError(Exception):
+                pass
+
+            class RequestError(Exception):
+                pass
+
+        def transcribe(path):
+            raise FakeSpeechRecognition.UnknownValueError()
+
+        body = (b"--xyz\r\nContent-Disposition: form-data; name=\"audio\"; filename=\"a.wav\"\r\n"
+                b"Content-Type: audio/wav\r\n\r\nRIFF0000\r\n--xyz--\r\n")
+        with unittest.mock.patch.object(evaluation, "sr", FakeSpeechRecognition), \
+             unittest.mock.patch.object(evaluation, "transcribe_audio_file", transcribe):
+            status, payload = await self.request("POST", "/evaluate/audio", body,
+                                                 "multipart/form-data; boundary=xyz")
+        self.assertEqual(status, 422)
+        self.assertEqual(payload["error"], "Speech recognition could not understand audio")
+
+    def test_parse_multipart(self):
+        body = (b"--xyz\r\nContent-Disposition: form-data; name=\"module\"\r\n\r\nStorytelling\r\n"
+                b"--xyz\r\nContent-Disposition: form-data; name=\"audio\"; filename=\"a.wav\"\r\n"
+                b"Content-Type: audio/wav\r\n\r\nRIFF0000\r\n--xyz--\r\n")
+        fields, files = parse_multipart("multipart/form-data; boundary=xyz", body)
+        self.assertEqual(fields["module"], "Storytelling")
+        self.assertEqual(files["audio"], b"RIFF0000")
+
+if __name__ == "__main__":
+    main()
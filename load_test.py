@@ -0,0 +1,325 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import resource
+import argparse
+import tempfile
+import threading
+import unittest
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import evaluation
+from speculative import SpeculativeEvaluator
+from micro_batch import MicroBatcher, MAX_BATCH
+from progress_store import get_store
+from session_memory import get_session, evict_idle
+
+FLOWS = ["text", "upload", "voice", "progress", "chat", "voice_integration"]
+SAMPLE_PHRASES = [
+    "I understand that deadlines can be challenging",
+    "teamwork lets people share ideas and solve problems",
+    "one day I found an old map in my attic",
+    "let's discuss how we can avoid missing them in the future",
+    "I would start by listening to my colleague's point of view",
+]
+
+class FakeServiceError(Exception):
+    pass
+
+# Stand-ins for the speech_recognition Recognizer and the pyttsx3 engine
+class FakeAudio:
+
+    def __init__(self, frame_data, sample_rate=16000, sample_width=2):
+        self.frame_data = frame_data
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+
+class FakeRecognizer:
+
+    def __init__(self, latency=0.0, error_rate=0.0, phrase_seconds=2.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.phrase_bytes = int(16000 * 2 * phrase_seconds)
+
+    def listen(self, source=None):
+        return FakeAudio(os.urandom(16) * (self.phrase_bytes // 16))
+
+    def record(self, source=None):
+        return self.listen(source)
+
+    def recognize_google(self, audio):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            raise FakeServiceError("Fake speech recognition error")
+        return random.choice(SAMPLE_PHRASES)
+
+class FakeTTSEngine:
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.queue = []
+
+    def say(self, text):
+        self.queue.append(text)
+
+    def runAndWait(self):
+        if self.latency:
+            time.sleep(self.latency * len(self.queue))
+        self.queue = []
+
+class Stats:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.errors = {}
+
+    @contextmanager
+    def timed(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            with self.lock:
+                self.errors[stage] = self.errors.get(stage, 0) + 1
+            raise
+        with self.lock:
+            self.timings.setdefault(stage, []).append(time.perf_counter() - start)
+
+    def summary(self, elapsed):
+        stages = {}
+        for stage in sorted(set(self.timings) | set(self.errors)):
+            samples = sorted(self.timings.get(stage, []))
+            stages[stage] = {
+                "count": len(samples),
+                "errors": self.errors.get(stage, 0),
+                "p50_ms": percentile(samples, 50) * 1000,
+                "p95_ms": percentile(samples, 95) * 1000,
+                "p99_ms": percentile(samples, 99) * 1000,
+            }
+        completed = sum(stats["count"] for stage, stats in stages.items() if stage.startswith("flow."))
+        return {
+            "elapsed_s": elapsed,
+            "flows_completed": completed,
+            "throughput_per_s": completed / elapsed if elapsed else 0.0,
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": stages,
+        }
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(samples)))
+    return samples[min(rank, len(samples)) - 1]
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+# One simulated trainee running the same pipeline functions the Streamlit
+# scripts call, with Gemini, Google STT and TTS replaced by local fakes.
+# The chat and voice_integration flows follow AI_Integration_1.py, which
+# logs to its own progress file through the store without search indexes.
+class SimulatedSession:
+
+    def __init__(self, session_id, config, stats, model):
+        self.session_id = session_id
+        self.config = config
+        self.stats = stats
+        self.model = model
+        self.recognizer = FakeRecognizer(config.stt_latency, config.stt_error_rate)
+        self.engine = FakeTTSEngine(config.tts_latency)
+        self.memory = get_session(session_id)
+
+    def run(self):
+        for _ in range(self.config.iterations):
+            for flow in self.config.flows:
+                try:
+                    with self.stats.timed(f"flow.{flow}"):
+                        getattr(self, f"run_{flow}")()
+                except Exception:
+                    pass
+
+    def feedback(self, user_input, module, feedback_text=None):
+        if feedback_text is None:
+            with self.stats.timed("gemini"):
+                feedback_text = evaluation.generate_feedback(evaluation.build_prompt(user_input, module), self.model)
+        with self.stats.timed("parse"):
+            evaluation.format_feedback(evaluation.parse_feedback(feedback_text))
+        with self.stats.timed("tts"):
+            self.engine.say(feedback_text)
+            self.engine.runAndWait()
+        with self.stats.timed("persist"):
+            evaluation.save_progress(user_input, feedback_text, self.config.progress_file, module=module)
+
+    def run_text(self):
+        module = random.choice(evaluation.MODULES)
+        self.feedback(" ".join(random.sample(SAMPLE_PHRASES, 3)), module)
+
+    def run_upload(self):
+        audio = self.recognizer.record()
+        with self.stats.timed("stt"):
+            user_input = self.recognizer.recognize_google(audio)
+        self.feedback(user_input, random.choice(evaluation.MODULES))
+
+    def run_voice(self):
+        module = random.choice(evaluation.MODULES)
+        transcript = self.memory.transcript("voice")
+        audio_data = self.memory.audio("voice")
+        transcript.clear()
+        audio_data.clear()
+        speculative = SpeculativeEvaluator(module, self.model, min_new_words=self.config.draft_words)
+        for _ in range(self.config.phrases):
+            audio = self.recognizer.listen()
+            audio_data.append(audio)
+            try:
+                with self.stats.timed("stt"):
+                    text = self.recognizer.recognize_google(audio)
+            except FakeServiceError:
+                continue
+            transcript.append(text)
+            speculative.update(transcript, transcript.word_count)
+        if not transcript:
+            raise FakeServiceError("Nothing was recognised")
+        with self.stats.timed("gemini.finalize"):
+            feedback_text = speculative.finalize(transcript.text)
+        self.feedback(transcript.text, module, feedback_text)
+
+    def run_chat(self):
+        user_input = " ".join(random.sample(SAMPLE_PHRASES, 2))
+        with self.stats.timed("gemini.chat"):
+            response = self.model.generate_content(evaluation.build_chat_prompt(user_input)).text
+        with self.stats.timed("persist.log"):
+            get_store(self.config.progress_log).append({"type": "chat", "input": user_input, "feedback": response})
+
+    def run_voice_integration(self):
+        transcription = self.memory.transcript("voice_integration")
+        audio_data = self.memory.audio("voice_integration")
+        transcription.clear()
+        audio_data.clear()
+        speculative = SpeculativeEvaluator(generate=lambda prompt: self.model.generate_content(prompt).text,
+                                           prompt_fn=evaluation.build_voice_prompt,
+                                           min_new_words=self.config.draft_words)
+        for _ in range(self.config.phrases):
+            audio = self.recognizer.listen()
+            audio_data.append(audio)
+            try:
+                with self.stats.timed("stt"):
+                    transcription.append(self.recognizer.recognize_google(audio))
+            except FakeServiceError:
+                continue
+            speculative.update(transcription, transcription.word_count)
+        if not audio_data:
+            raise FakeServiceError("Nothing was recorded")
+        # Stop Recording re-recognises the whole clip, which may have spilled to disk
+        with self.stats.timed("stt.full"):
+            full_audio = FakeAudio(audio_data.frame_data(), audio_data.sample_rate, audio_data.sample_width)
+            text_output = self.recognizer.recognize_google(full_audio)
+        with self.stats.timed("gemini.finalize"):
+            response = speculative.finalize(text_output)
+        with self.stats.timed("persist.log"):
+            get_store(self.config.progress_log).append({"type": "voice", "transcription": text_output, "feedback": response})
+
+    def run_progress(self):
+        with self.stats.timed("progress.load"):
+            evaluation.load_progress(self.config.progress_file)
+        with self.stats.timed("progress.search"):
+            evaluation.search_progress(random.choice(SAMPLE_PHRASES), progress_file=self.config.progress_file)
+
+def run_load_test(config):
+    stats = Stats()
+    model = evaluation.FakeGenerativeModel(latency=config.gemini_latency, error_rate=config.gemini_error_rate)
+    batcher = None
+    if config.batch_window > 0:
+        model = batcher = MicroBatcher(model, config.batch_window / 1000, config.max_batch)
+    sessions = [SimulatedSession(f"load-test-{i}", config, stats, model) for i in range(config.sessions)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=config.sessions) as executor:
+        for future in [executor.submit(session.run) for session in sessions]:
+            future.result()
+    summary = stats.summary(time.perf_counter() - start)
+    if batcher is not None:
+        batcher.close()
+        summary["batching"] = dict(batcher.stats)
+    evict_idle(max_idle=-1)
+    return summary
+
+def format_summary(summary):
+    lines = [
+        f"Flows completed: {summary['flows_completed']} in {summary['elapsed_s']:.2f}s "
+        f"({summary['throughput_per_s']:.2f}/s), peak RSS {summary['peak_rss_mb']:.1f} MB",
+    ]
+    if "batching" in summary:
+        lines.append("Batching: " + ", ".join(f"{key}={value}" for key, value in summary["batching"].items()))
+    lines.append(f"{'stage':<24}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, stats in summary["stages"].items():
+        lines.append(f"{stage:<24}{stats['count']:>8}{stats['errors']:>8}"
+                     f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+    return "\n".join(lines)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Drive simulated concurrent trainee sessions against fake backends.")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--flows", type=lambda value: value.split(","), default=FLOWS,
+                        help="Comma-separated subset of: " + ",".join(FLOWS))
+    parser.add_argument("--phrases", type=int, default=5, help="Phrases spoken per voice flow.")
+    parser.add_argument("--draft-words", type=int, default=12, help="New words before a speculative draft starts.")
+    parser.add_argument("--gemini-latency", type=float, default=0.5)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--stt-latency", type=float, default=0.2)
+    parser.add_argument("--stt-error-rate", type=float, default=0.0)
+    parser.add_argument("--tts-latency", type=float, default=0.1)
+    parser.add_argument("--batch-window", type=float, default=0.0,
+                        help="Micro-batching window in milliseconds; 0 disables batching.")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--progress-file", default=None, help="Defaults to a temporary file.")
+    parser.add_argument("--progress-log", default=None,
+                        help="Log used by the chat and voice_integration flows; defaults to a temporary file.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    return parser
+
+def main():
+    config = build_parser().parse_args()
+    unknown = set(config.flows) - set(FLOWS)
+    if unknown:
+        sys.exit(f"Unknown flows: {', '.join(sorted(unknown))}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if config.progress_file is None:
+            config.progress_file = os.path.join(tmpdir, "progress.json")
+        if config.progress_log is None:
+            config.progress_log = os.path.join(tmpdir, "progress_log.json")
+        summary = run_load_test(config)
+    print(json.dumps(summary, indent=4) if config.json else format_summary(summary))
+
+# Unit/Integration Tests
+class TestLoadTest(unittest.TestCase):
+
+    def test_runs_all_flows(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config = build_parser().parse_args([
+                "--sessions", "3", "--iterations", "2", "--gemini-latency", "0", "--stt-latency", "0",
+                "--tts-latency", "0", "--draft-words", "3", "--progress-file", os.path.join(tmpdir, "progress.json"),
+                "--progress-log", os.path.join(tmpdir, "progress_log.json"),
+            ])
+            summary = run_load_test(config)
+            log_entries = len(get_store(config.progress_log))
+        self.assertEqual(summary["flows_completed"], 3 * 2 * len(FLOWS))
+        self.assertIn("gemini", summary["stages"])
+        self.assertIn("progress.search", summary["stages"])
+        self.assertIn("stt.full", summary["stages"])
+        self.assertEqual(log_entries, 3 * 2 * 2)
+
+    def test_percentile(self):
+        samples = [i / 100 for i in range(1, 101)]
+        self.assertEqual(percentile(samples, 50), 0.5)
+        self.assertEqual(percentile(samples, 99), 0.99)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import time
+import queue
+import threading
+import unittest
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from evaluation import (TextResponse, FakeGenerativeModel, build_batch_prompt, split_batch_response, build_prompt,
+                        generate_feedback)
+
+BATCH_WINDOW = 0.05
+MAX_BATCH = 8
+
+# Collects prompts that arrive within a short window and sends them to Gemini
+# as one multi-item request. Exposes generate_content() so it can be passed
+# anywhere a GenerativeModel is expected. Answers that cannot be split back
+# out, or fail validation, are retried as single calls.
+class MicroBatcher:
+
+    def __init__(self, model, window=BATCH_WINDOW, max_batch=MAX_BATCH, validate=bool, max_in_flight=4):
+        self.model = model
+        self.window = window
+        self.max_batch = max_batch
+        self.validate = validate
+        self.pending = queue.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self.stats = {"requests": 0, "batches": 0, "batched_items": 0, "fallbacks": 0}
+        self.stats_lock = threading.Lock()
+        self.closed = False
+        self.thread = threading.Thread(target=self._collect, name="micro-batcher", daemon=True)
+        self.thread.start()
+
+    def submit(self, prompt):
+        if self.closed:
+            raise RuntimeError("MicroBatcher is closed.")
+        future = Future()
+        self.pending.put((prompt, future))
+        return future
+
+    def generate_content(self, prompt):
+        return self.submit(prompt).result()
+
+    def _count(self, key, amount=1):
+        with self.stats_lock:
+            self.stats[key] += amount
+
+    def _collect(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.pending.put(None)
+                    break
+                batch.append(item)
+            # Dispatch off the collector thread so the next window starts at once
+            self.executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        self._count("requests", len(batch))
+        if len(batch) == 1:
+            self._single(*batch[0])
+            return
+        self._count("batches")
+        try:
+            response = self.model.generate_content(build_batch_prompt([prompt for prompt, _ in batch]))
+            answers = split_batch_response(response.text, len(batch))
+        except Exception as e:
+            print(f"Batched evaluation failed, retrying individually: {e}")
+            answers = None
+        if answers is None:
+            answers = [None] * len(batch)
+        retries = []
+        for (prompt, future), answer in zip(batch, answers):
+            if answer is not None and self.validate(answer):
+                self._count("batched_items")
+                future.set_result(TextResponse(answer))
+            else:
+                retries.append((prompt, future))
+        if retries:
+            self._count("fallbacks", len(retries))
+            for retry in retries[1:]:
+                self.executor.submit(self._single, *retry)
+            self._single(*retries[0])
+
+    def _single(self, prompt, future):
+        try:
+            future.set_result(self.model.generate_content(prompt))
+        except Exception as e:
+            future.set_exception(e)
+
+    def close(self):
+        self.closed = True
+        self.pending.put(None)
+        self.thread.join()
+        self.executor.shutdown(wait=True)
+
+# Unit/Integration Tests
+class ScriptedModel:
+
+    def __init__(self, batch_text=None):
+        self.batch_text = batch_text
+        self.prompts = []
+        self.fake = FakeGenerativeModel()
+
+    def generate_content(self, prompt):
+        self.prompts.append(prompt)
+        if self.batch_text is not None and "=== ITEM" in prompt:
+            return TextResponse(self.batch_text)
+        response = self.fake.generate_content(prompt)
+        # Gemini candidates hold a Content message whose str() is not the text
+        response.candidates[0].content = f"parts {{ text: {response.text!r} }} role: \"model\""
+        return response
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def run_batch(self, model, count=3, **kwargs):
+        batcher = MicroBatcher(model, window=0.2, max_batch=count, **kwargs)
+        prompts = [build_prompt(f"response number {i}", "Storytelling") for i in range(count)]
+        futures = [batcher.submit(prompt) for prompt in prompts]
+        results = [future.result(timeout=5).text for future in futures]
+        batcher.close()
+        return batcher, prompts, results
+
+    def test_requests_in_window_share_one_call(self):
+        model = ScriptedModel()
+        batcher, prompts, results = self.run_batch(model)
+        self.assertEqual(len(model.prompts), 1)
+        self.assertEqual(batcher.stats["batched_items"], 3)
+        self.assertEqual(results[1], FakeGenerativeModel().generate_content(prompts[1]).text)
+
+    def test_unparseable_batch_falls_back_to_single_calls(self):
+        model = ScriptedModel(batch_text="Sorry, here is one combined answer.")
+        batcher, prompts, results = self.run_batch(model)
+        self.assertEqual(len(model.prompts), 4)
+        self.assertEqual(batcher.stats["fallbacks"], 3)
+        self.assertEqual(results[2], FakeGenerativeModel().generate_content(prompts[2]).text)
+
+    def test_invalid_items_are_retried(self):
+        model = ScriptedModel(batch_text="=== ITEM 1 ===\nClarity Score: 8/10\n=== ITEM 2 ===\nno scores")
+        batcher, prompts, results = self.run_batch(model, count=2, validate=lambda answer: "Score" in answer)
+        self.assertEqual(results[0], "Clarity Score: 8/10")
+        self.assertEqual(batcher.stats["fallbacks"], 1)
+        self.assertEqual(results[1], FakeGenerativeModel().generate_content(prompts[1]).text)
+
+    def test_batched_and_single_feedback_text_match(self):
+        prompts = [build_prompt(f"response number {i}", "Storytelling") for i in range(2)]
+        single = [generate_feedback(prompt, ScriptedModel()) for prompt in prompts]
+        batcher = MicroBatcher(ScriptedModel(), window=0.2, max_batch=2)
+        futures = [batcher.submit(prompt) for prompt in prompts]
+        batched = [future.result(timeout=5).text for future in futures]
+        batcher.close()
+        self.assertEqual(batcher.stats["batched_items"], 2)
+        self.assertEqual(batched, single)
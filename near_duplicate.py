@@ -0,0 +1,130 @@
+import os
+import re
+import random
+import hashlib
+import tempfile
+import unittest
+
+from progress_store import ProgressStore
+from sidecar_index import SidecarIndex, get_shared
+
+DUPLICATE_THRESHOLD = float(os.environ.get("VERBAL_TRAINER_DUPLICATE_THRESHOLD", 0.8))
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+MERSENNE_PRIME = (1 << 61) - 1
+FILLER_WORDS = frozenset(["um", "uh", "er", "ah", "like", "so", "well", "okay", "ok"])
+WORD_RE = re.compile(r"[a-z0-9']+")
+
+_rng = random.Random(1729)
+PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+def normalize(text):
+    return [word for word in WORD_RE.findall(text.lower()) if word not in FILLER_WORDS]
+
+def shingles(text):
+    words = normalize(text)
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def minhash(text):
+    hashes = [int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+              for shingle in shingles(text)]
+    if not hashes:
+        return None
+    return [min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in PERMUTATIONS]
+
+def similarity(signature, other):
+    return sum(1 for x, y in zip(signature, other) if x == y) / NUM_PERM
+
+# MinHash signatures bucketed by LSH band and scoped per module and topic, so
+# a lookup only compares against entries that share at least one band.
+# Signatures are persisted in a JSONL sidecar like the search index.
+class NearDuplicateIndex(SidecarIndex):
+
+    SUFFIX = "_minhash.jsonl"
+
+    def _clear(self):
+        self.buckets = {}
+        self.signatures = []
+
+    def _build_record(self, doc_id, entry):
+        text = entry.get("user_input") or entry.get("transcription") or entry.get("response") or ""
+        return {
+            "id": doc_id,
+            "scope": scope_key(entry.get("module") or entry.get("type"), entry.get("topic")),
+            "signature": minhash(text) if entry.get("feedback") else None,
+        }
+
+    def _add_record(self, record):
+        signature = record["signature"]
+        self.signatures.append(signature)
+        if signature is None:
+            return
+        scope = record["scope"]
+        for band in range(BANDS):
+            key = (scope, band, tuple(signature[band * ROWS:(band + 1) * ROWS]))
+            self.buckets.setdefault(key, []).append(record["id"])
+
+    def find(self, text, module=None, topic=None, threshold=DUPLICATE_THRESHOLD):
+        signature = minhash(text)
+        if signature is None:
+            return None
+        scope = scope_key(module, topic)
+        self.refresh()
+        with self.lock:
+            candidates = set()
+            for band in range(BANDS):
+                candidates.update(self.buckets.get((scope, band, tuple(signature[band * ROWS:(band + 1) * ROWS])), ()))
+            best = None
+            for doc_id in candidates:
+                score = similarity(signature, self.signatures[doc_id])
+                if score >= threshold and (best is None or (score, doc_id) > (best[1], best[0])):
+                    best = (doc_id, score)
+        return best
+
+def scope_key(module, topic):
+    return f"{module or ''}|{topic or ''}"
+
+def get_index(path):
+    return get_shared(NearDuplicateIndex, path)
+
+# Unit/Integration Tests
+class TestNearDuplicateIndex(unittest.TestCase):
+
+    ANSWER = ("I understand that deadlines can be challenging, but missing them affects the whole team. "
+              "Let's discuss how we can plan better and avoid missing them in the future.")
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = ProgressStore(os.path.join(self.tmpdir.name, "progress.json"))
+        self.store.append({"user_input": self.ANSWER, "feedback": "Clarity Score: 8/10",
+                           "module": "Conflict Resolution", "topic": "Missed deadline"})
+        self.store.append({"user_input": "Teamwork lets people share ideas and solve problems efficiently.",
+                           "feedback": "Clarity Score: 6/10", "module": "Impromptu Speaking"})
+        self.index = NearDuplicateIndex(self.store)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_finds_reworded_attempt(self):
+        attempt = ("Um I understand that deadlines can be challenging but missing them affects the whole team. "
+                   "Let's discuss how we can plan better and avoid missing them in future.")
+        match = self.index.find(attempt, "Conflict Resolution", "Missed deadline")
+        self.assertEqual(match[0], 0)
+        self.assertGreaterEqual(match[1], DUPLICATE_THRESHOLD)
+
+    def test_scoped_by_module_and_topic(self):
+        self.assertIsNone(self.index.find(self.ANSWER, "Storytelling", "Missed deadline"))
+        self.assertIsNone(self.index.find(self.ANSWER, "Conflict Resolution", "Another topic"))
+
+    def test_unrelated_text_does_not_match(self):
+        self.assertIsNone(self.index.find("One day I found an old map in my attic.", "Conflict Resolution", "Missed deadline"))
+
+    def test_reload_from_sidecar(self):
+        reopened = NearDuplicateIndex(self.store)
+        self.assertEqual(len(reopened), 2)
+        self.assertEqual(reopened.find(self.ANSWER, "Conflict Resolution", "Missed deadline")[0], 0)
@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import unittest
+import unittest.mock
+from datetime import datetime
+
+CALIBRATION_FILE = os.environ.get("VERBAL_TRAINER_CALIBRATION_FILE", "noise_profiles.json")
+CALIBRATION_MAX_AGE = float(os.environ.get("VERBAL_TRAINER_CALIBRATION_MAX_AGE", 7 * 24 * 3600))
+CALIBRATION_DURATION = 1
+SAVE_INTERVAL = 30
+# Weight given to the latest adapted threshold when folding it into the profile
+ADAPT_RATE = 0.3
+MIN_ENERGY_THRESHOLD = 50
+MAX_ENERGY_THRESHOLD = 4000
+TUNED_ATTRIBUTES = ("energy_threshold", "dynamic_energy_adjustment_damping", "dynamic_energy_ratio", "pause_threshold")
+
+_lock = threading.Lock()
+_profiles = None
+
+def load_profiles(path=CALIBRATION_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+
+def save_profiles(profiles, path=CALIBRATION_FILE):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(profiles, f, indent=4)
+    os.replace(temp_path, path)
+
+def device_key(source):
+    device_index = getattr(source, "device_index", None)
+    if device_index is None:
+        return "default"
+    try:
+        import speech_recognition as sr
+        return sr.Microphone.list_microphone_names()[device_index]
+    except Exception:
+        return f"device-{device_index}"
+
+# Measures ambient noise once per device and stores the recognizer's energy
+# threshold and dynamic parameters. Later captures start listening at once
+# with the stored values, and the threshold that speech_recognition adapts
+# from silence frames during listen() is folded back into the profile.
+class NoiseCalibrator:
+
+    def __init__(self, recognizer, path=CALIBRATION_FILE, max_age=CALIBRATION_MAX_AGE):
+        self.recognizer = recognizer
+        self.path = path
+        self.max_age = max_age
+        self.device = None
+        self.last_save = 0.0
+
+    def profile(self, device):
+        global _profiles
+        with _lock:
+            if _profiles is None or _profiles[0] != self.path:
+                _profiles = (self.path, load_profiles(self.path))
+            return _profiles[1].get(device)
+
+    def prepare(self, source):
+        self.device = device_key(source)
+        self.recognizer.dynamic_energy_threshold = True
+        profile = self.profile(self.device)
+        if profile and time.time() - profile.get("calibrated_at", 0) < self.max_age:
+            for attribute in TUNED_ATTRIBUTES:
+                if attribute in profile:
+                    setattr(self.recognizer, attribute, profile[attribute])
+            return False
+        self.recognizer.adjust_for_ambient_noise(source, duration=CALIBRATION_DURATION)
+        self.store(calibrated=True)
+        return True
+
+    def observe(self):
+        if self.device is None:
+            return
+        profile = self.profile(self.device) or {}
+        previous = profile.get("energy_threshold", self.recognizer.energy_threshold)
+        adapted = (1 - ADAPT_RATE) * previous + ADAPT_RATE * self.recognizer.energy_threshold
+        self.recognizer.energy_threshold = min(max(adapted, MIN_ENERGY_THRESHOLD), MAX_ENERGY_THRESHOLD)
+        self.store(force=time.monotonic() - self.last_save > SAVE_INTERVAL)
+
+    def flush(self):
+        if self.device is not None:
+            self.store()
+
+    # Updates the cached profile on every call; the file is only re-read, to
+    # keep other devices' profiles saved since, when it is written
+    def store(self, calibrated=False, force=True):
+        global _profiles
+        with _lock:
+            save = calibrated or force
+            if save or _profiles is None or _profiles[0] != self.path:
+                _profiles = (self.path, load_profiles(self.path))
+            profiles = _profiles[1]
+            profile = profiles.setdefault(self.device, {})
+            for attribute in TUNED_ATTRIBUTES:
+                profile[attribute] = getattr(self.recognizer, attribute)
+            if calibrated:
+                profile["calibrated_at"] = time.time()
+            profile["updated"] = datetime.now().isoformat(timespec="seconds")
+            if save:
+                save_profiles(profiles, self.path)
+                self.last_save = time.monotonic()
+
+# Unit/Integration Tests
+class FakeRecognizer:
+
+    def __init__(self):
+        self.energy_threshold = 300
+        self.dynamic_energy_threshold = False
+        self.dynamic_energy_adjustment_damping = 0.15
+        self.dynamic_energy_ratio = 1.5
+        self.pause_threshold = 0.8
+        self.calibrations = 0
+
+    def adjust_for_ambient_noise(self, source, duration=1):
+        self.calibrations += 1
+        self.energy_threshold = 600
+
+class TestNoiseCalibrator(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "noise_profiles.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_calibrates_once_then_reuses_profile(self):
+        first = FakeRecognizer()
+        self.assertTrue(NoiseCalibrator(first, self.path).prepare(object()))
+        second = FakeRecognizer()
+        self.assertFalse(NoiseCalibrator(second, self.path).prepare(object()))
+        self.assertEqual(second.calibrations, 0)
+        self.assertEqual(second.energy_threshold, 600)
+        self.assertTrue(second.dynamic_energy_threshold)
+
+    def test_stale_profile_is_recalibrated(self):
+        NoiseCalibrator(FakeRecognizer(), self.path).prepare(object())
+        recognizer = FakeRecognizer()
+        self.assertTrue(NoiseCalibrator(recognizer, self.path, max_age=-1).prepare(object()))
+
+    def test_observe_adapts_threshold(self):
+        recognizer = FakeRecognizer()
+        calibrator = NoiseCalibrator(recognizer, self.path)
+        calibrator.prepare(object())
+        recognizer.energy_threshold = 1000
+        calibrator.observe()
+        self.assertAlmostEqual(recognizer.energy_threshold, 0.7 * 600 + 0.3 * 1000)
+        calibrator.flush()
+        self.assertAlmostEqual(load_profiles(self.path)["default"]["energy_threshold"], recognizer.energy_threshold)
+
+    def test_throttled_observe_does_not_read_file(self):
+        recognizer = FakeRecognizer()
+        calibrator = NoiseCalibrator(recognizer, self.path)
+        calibrator.prepare(object())
+        recognizer.energy_threshold = 1000
+        with unittest.mock.patch(__name__ + ".load_profiles") as loaded:
+            calibrator.observe()
+            calibrator.observe()
+        loaded.assert_not_called()
+        self.assertEqual(calibrator.profile("default")["energy_threshold"], recognizer.energy_threshold)
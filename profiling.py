@@ -0,0 +1,202 @@
+import io
+import os
+import time
+import pstats
+import cProfile
+import tempfile
+import threading
+import unittest
+import tracemalloc
+from contextlib import nullcontext
+from datetime import datetime
+
+PROFILE_ENABLED = os.environ.get("VERBAL_TRAINER_PROFILE") == "1"
+PROFILE_DIR = os.environ.get("VERBAL_TRAINER_PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.environ.get("VERBAL_TRAINER_PROFILE_KEEP", 20))
+TOP_FUNCTIONS = 15
+TOP_ALLOCATIONS = 10
+
+_NULL = nullcontext()
+_state = threading.local()
+# tracemalloc is process-wide, so top-level sections on different threads
+# share one tracing session; the last one out stops it
+_tracing_guard = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+
+# Returns a shared no-op context unless profiling is on, so the disabled path
+# costs a couple of attribute lookups. Sections nested inside a profiled
+# section are timed and reported as part of the outer profile.
+def profile_section(name, force=False, profile_dir=None):
+    if PROFILE_ENABLED or force or getattr(_state, "active", None) is not None:
+        return ProfiledSection(name, profile_dir or PROFILE_DIR)
+    return _NULL
+
+def profiling_requested():
+    if PROFILE_ENABLED:
+        return True
+    try:
+        import streamlit as st
+        return st.query_params.get("profile") == "1"
+    except Exception:
+        return False
+
+class ProfiledSection:
+
+    def __init__(self, name, profile_dir):
+        self.name = name
+        self.profile_dir = profile_dir
+        self.outer = None
+        self.sections = []
+        self.profiler = None
+        self.summary = None
+
+    def __enter__(self):
+        self.outer = getattr(_state, "active", None)
+        _state.active = self
+        if self.outer is None:
+            self._start_tracing()
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows one active profiler; another session has it
+                self.profiler = None
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        _state.active = self.outer
+        if self.outer is not None:
+            self.outer.sections.append((self.name, elapsed))
+            return False
+        if self.profiler is not None:
+            self.profiler.disable()
+        snapshot, peak = self._stop_tracing()
+        self.summary = self.summarize(elapsed, peak, snapshot)
+        self.write(self.summary)
+        return False
+
+    def _start_tracing(self):
+        global _tracing_users, _tracing_owned
+        with _tracing_guard:
+            if _tracing_users == 0:
+                _tracing_owned = not tracemalloc.is_tracing()
+                if _tracing_owned:
+                    tracemalloc.start()
+                # Only reset when no other section is measuring its own peak
+                tracemalloc.reset_peak()
+            _tracing_users += 1
+
+    def _stop_tracing(self):
+        global _tracing_users
+        with _tracing_guard:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            _tracing_users -= 1
+            if _tracing_users == 0 and _tracing_owned:
+                tracemalloc.stop()
+        return snapshot, peak
+
+    def summarize(self, elapsed, peak, snapshot):
+        stats_text = io.StringIO()
+        if self.profiler is not None:
+            pstats.Stats(self.profiler, stream=stats_text).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        else:
+            stats_text.write("cProfile was busy in another thread; only timings were recorded.\n")
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ])
+        allocations = [f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}: "
+                       f"{stat.size / 1024:.1f} KiB in {stat.count} blocks"
+                       for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]]
+        return {
+            "name": self.name,
+            "started": datetime.now().isoformat(timespec="seconds"),
+            "seconds": elapsed,
+            "peak_memory_kib": peak / 1024,
+            "sections": list(self.sections),
+            "allocations": allocations,
+            "functions": stats_text.getvalue(),
+        }
+
+    def write(self, summary):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        base = os.path.join(self.profile_dir, f"{stamp}-{self.name}")
+        if self.profiler is not None:
+            self.profiler.dump_stats(base + ".prof")
+        else:
+            open(base + ".prof", "wb").close()
+        with open(base + ".txt", "w") as f:
+            f.write(format_summary(summary))
+        summary["path"] = base + ".prof"
+        rotate(self.profile_dir)
+
+def rotate(profile_dir, keep=PROFILE_KEEP):
+    runs = sorted(name[:-len(".prof")] for name in os.listdir(profile_dir) if name.endswith(".prof"))
+    for run in runs[:-keep] if keep else runs:
+        for suffix in (".prof", ".txt"):
+            path = os.path.join(profile_dir, run + suffix)
+            if os.path.exists(path):
+                os.unlink(path)
+
+def format_summary(summary):
+    lines = [f"{summary['name']}: {summary['seconds'] * 1000:.1f} ms, peak traced memory {summary['peak_memory_kib']:.1f} KiB"]
+    lines += [f"  {name}: {seconds * 1000:.1f} ms" for name, seconds in summary["sections"]]
+    lines.append("")
+    lines.append("Top allocation sites:")
+    lines += [f"  {line}" for line in summary["allocations"]]
+    lines.append("")
+    lines.append(summary["functions"])
+    return "\n".join(lines)
+
+# Unit/Integration Tests
+class TestProfiling(unittest.TestCase):
+
+    def test_disabled_is_noop(self):
+        if not PROFILE_ENABLED:
+            self.assertIs(profile_section("rerun"), _NULL)
+
+    def test_profile_written_and_rotated(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for _ in range(PROFILE_KEEP + 2):
+                with profile_section("rerun", force=True, profile_dir=tmpdir) as section:
+                    with profile_section("evaluation"):
+                        [str(i) for i in range(1000)]
+            files = os.listdir(tmpdir)
+            self.assertEqual(len([name for name in files if name.endswith(".prof")]), PROFILE_KEEP)
+            summary = section.summary
+            self.assertEqual(summary["sections"][0][0], "evaluation")
+            self.assertIn("cumulative", summary["functions"])
+
+    def test_overlapping_sections_on_two_threads(self):
+        started, inside, finished = threading.Event(), threading.Event(), threading.Event()
+        results = {}
+
+        def run(name, before_exit, on_enter):
+            try:
+                with profile_section(name, force=True, profile_dir=tmpdir) as section:
+                    on_enter.set()
+                    before_exit.wait(5)
+                    [str(i) for i in range(1000)]
+                results[name] = section.summary
+            except Exception as e:
+                results[name] = e
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # The first section starts tracing and exits while the second is still open
+            first = threading.Thread(target=run, args=("first", inside, started))
+            second = threading.Thread(target=run, args=("second", finished, inside))
+            first.start()
+            started.wait(5)
+            second.start()
+            first.join()
+            finished.set()
+            second.join()
+        self.assertIsInstance(results["first"], dict)
+        self.assertIsInstance(results["second"], dict)
+        self.assertFalse(tracemalloc.is_tracing())
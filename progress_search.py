@@ -0,0 +1,341 @@
+import os
+import re
+import math
+import heapq
+import bisect
+import random
+import tempfile
+import unittest
+import unittest.mock
+from array import array
+from collections import Counter
+
+from progress_store import ProgressStore
+from sidecar_index import SidecarIndex, get_shared
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+STOPWORDS = frozenset("""a an and are as at be but by for from has have i in is it its of on or so that the
+this to was were will with you your my me we our they them he she his her not do does did""".split())
+TEXT_FIELDS = ("user_input", "input", "response", "transcription", "feedback")
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_DOC_ID = 0xFFFFFFFF
+DIRECT_SCAN_LIMIT = 2048
+EXACT_POSTINGS_LIMIT = 8192
+MAX_CANDIDATES = 128
+ACCUMULATE_LIMIT = 50000
+
+# Light plural folding so "deadline" matches "deadlines"
+def stem(token):
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+def tokenize(text):
+    tokens = (token.strip("'") for token in TOKEN_RE.findall(text.lower()))
+    return [stem(token) for token in tokens if token and token not in STOPWORDS]
+
+def entry_text(entry):
+    return " ".join(str(entry[field]) for field in TEXT_FIELDS if entry.get(field))
+
+# Inverted index over progress entries, persisted as a JSONL sidecar.
+#
+# Each term also keeps impact lists: one per term frequency, sorted by
+# document length. BM25 weight falls as length grows, so merging the lists
+# yields postings in descending score order for any average length, and a
+# query stops once no unseen document can beat the current top results.
+# Queries made only of very common terms stop after MAX_CANDIDATES. Impact
+# lists are kept per module as well, so a module filter never walks other
+# modules' postings.
+class SearchIndex(SidecarIndex):
+
+    SUFFIX = "_search.jsonl"
+
+    def _clear(self):
+        self.postings = {}
+        self.impacts = {}
+        self.modules = []
+        self.dates = []
+        self.date_ids = []
+        self.lengths = []
+        self.total_length = 0
+        self.dates_sorted = True
+
+    def _add_record(self, record):
+        doc_id = record["id"]
+        module = record.get("module")
+        length = sum(record["terms"].values())
+        # Shorter documents first, newer first among equal lengths
+        key = (length << 32) | (MAX_DOC_ID - doc_id)
+        for term, count in record["terms"].items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = (array("I"), array("H"))
+            if count > 0xFFFF:
+                count = 0xFFFF
+            posting[0].append(doc_id)
+            posting[1].append(count)
+            if self.impacts:
+                for scope in (None, module) if module else (None,):
+                    buckets = self.impacts.get((scope, term))
+                    if buckets is not None:
+                        bisect.insort(buckets.setdefault(count, array("Q")), key)
+        self.modules.append(module)
+        date = record.get("date")
+        self.dates.append(date)
+        if date:
+            if self.date_ids and (date, doc_id) < self.date_ids[-1]:
+                self.dates_sorted = False
+            self.date_ids.append((date, doc_id))
+        self.lengths.append(length)
+        self.total_length += length
+
+    # Built on first use so loading only replays postings
+    def _impact_lists(self, scope, term):
+        buckets = self.impacts.get((scope, term))
+        if buckets is None:
+            grouped = {}
+            ids, counts = self.postings[term]
+            for doc_id, count in zip(ids, counts):
+                if scope is None or self.modules[doc_id] == scope:
+                    grouped.setdefault(count, []).append((self.lengths[doc_id] << 32) | (MAX_DOC_ID - doc_id))
+            buckets = self.impacts[(scope, term)] = {count: array("Q", sorted(keys)) for count, keys in grouped.items()}
+        return buckets
+
+    def _build_record(self, doc_id, entry):
+        timestamp = entry.get("timestamp")
+        return {
+            "id": doc_id,
+            "module": entry.get("module") or entry.get("type"),
+            "date": timestamp[:10] if timestamp else None,
+            "terms": dict(Counter(tokenize(entry_text(entry)))),
+        }
+
+    def search(self, query, module=None, date_from=None, date_to=None, limit=10):
+        terms = set(tokenize(query))
+        self.refresh()
+        with self.lock:
+            if not terms or not self.lengths or limit <= 0:
+                return []
+            doc_count = len(self.lengths)
+            average_length = self.total_length / doc_count or 1
+            idfs = {}
+            for term in terms:
+                if term in self.postings:
+                    df = len(self.postings[term][0])
+                    idfs[term] = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            if not idfs:
+                return []
+            if sum(len(self.postings[term][0]) for term in idfs) <= EXACT_POSTINGS_LIMIT:
+                return self._accumulate(idfs, module, date_from, date_to, average_length, limit)
+            window = None
+            if date_from or date_to:
+                if not self.dates_sorted:
+                    self.date_ids.sort()
+                    self.dates_sorted = True
+                lo = bisect.bisect_left(self.date_ids, (date_from,)) if date_from else 0
+                hi = bisect.bisect_right(self.date_ids, (date_to, math.inf)) if date_to else len(self.date_ids)
+                window = (lo, hi)
+                # A narrow date range is cheaper to score directly than to filter postings
+                if hi - lo <= DIRECT_SCAN_LIMIT:
+                    return self._score_window(window, idfs, module, average_length, limit)
+            return self._top_k(idfs, module, date_from, date_to, window, average_length, limit)
+
+    def _accumulate(self, idfs, module, date_from, date_to, average_length, limit):
+        lengths, modules, dates = self.lengths, self.modules, self.dates
+        base = BM25_K1 * (1 - BM25_B)
+        scale = BM25_K1 * BM25_B / average_length
+        scores = {}
+        for term, idf in idfs.items():
+            ids, counts = self.postings[term]
+            boost = idf * (BM25_K1 + 1)
+            for doc_id, count in zip(ids, counts):
+                if module and modules[doc_id] != module:
+                    continue
+                if date_from or date_to:
+                    date = dates[doc_id]
+                    if date is None or (date_from and date < date_from) or (date_to and date > date_to):
+                        continue
+                scores[doc_id] = scores.get(doc_id, 0.0) + boost * count / (count + base + scale * lengths[doc_id])
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+
+    def _score_window(self, window, idfs, module, average_length, limit):
+        candidates = (doc_id for _, doc_id in self.date_ids[window[0]:window[1]])
+        scored = ((self._score(doc_id, idfs, average_length), doc_id) for doc_id in candidates
+                  if not module or self.modules[doc_id] == module)
+        top = heapq.nlargest(limit, (item for item in scored if item[0] > 0))
+        return [(doc_id, score) for score, doc_id in top]
+
+    def _score(self, doc_id, idfs, average_length):
+        score = 0.0
+        for term, idf in idfs.items():
+            ids, counts = self.postings[term]
+            i = bisect.bisect_left(ids, doc_id)
+            if i < len(ids) and ids[i] == doc_id:
+                score += idf * bm25_weight(counts[i], self.lengths[doc_id], average_length)
+        return score
+
+    # Threshold algorithm over the per-term impact streams, always advancing
+    # the stream whose next posting carries the most weight
+    def _top_k(self, idfs, module, date_from, date_to, window, average_length, limit):
+        heads = []
+        for term, idf in idfs.items():
+            buckets = self._impact_lists(module or None, term)
+            if buckets:
+                stream = impact_stream(buckets, average_length)
+                weight, doc_id = next(stream)
+                heads.append([idf * weight, doc_id, idf, stream])
+        top, seen, rejected = [], set(), 0
+        while heads:
+            head = max(heads, key=lambda head: head[0])
+            doc_id = head[1]
+            following = next(head[3], None)
+            if following is None:
+                heads.remove(head)
+            else:
+                head[0], head[1] = head[2] * following[0], following[1]
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            if window:
+                date = self.dates[doc_id]
+                if date is None or (date_from and date < date_from) or (date_to and date > date_to):
+                    # Once filtering has cost more than the date range holds,
+                    # scoring the range directly is cheaper and exact
+                    rejected += 1
+                    if rejected > window[1] - window[0]:
+                        return self._score_window(window, idfs, module, average_length, limit)
+                    continue
+            item = (self._score(doc_id, idfs, average_length), doc_id)
+            if len(top) < limit:
+                heapq.heappush(top, item)
+            elif item > top[0]:
+                heapq.heapreplace(top, item)
+            if len(top) == limit and top[0][0] >= sum(head[0] for head in heads):
+                break
+            if len(seen) - rejected >= MAX_CANDIDATES:
+                # Rare terms that seldom co-occur converge slowly; score them
+                # exactly. Terms found in nearly every entry ("clarity",
+                # "score") barely separate documents, so keep what we have.
+                if sum(len(self.postings[term][0]) for term in idfs) <= ACCUMULATE_LIMIT:
+                    return self._accumulate(idfs, module, date_from, date_to, average_length, limit)
+                break
+        return [(doc_id, score) for score, doc_id in sorted(top, reverse=True)]
+
+def bm25_weight(count, length, average_length):
+    return count * (BM25_K1 + 1) / (count + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length))
+
+# Yields (weight, doc_id) for one term in descending order
+def impact_stream(buckets, average_length):
+    def head(count, position):
+        key = buckets[count][position]
+        return (-bm25_weight(count, key >> 32, average_length), (key & MAX_DOC_ID) - MAX_DOC_ID, count, position)
+    heap = [head(count, 0) for count, bucket in buckets.items() if bucket]
+    heapq.heapify(heap)
+    while heap:
+        weight, negative_id, count, position = heap[0]
+        yield -weight, -negative_id
+        if position + 1 < len(buckets[count]):
+            heapq.heapreplace(heap, head(count, position + 1))
+        else:
+            heapq.heappop(heap)
+
+def get_index(path):
+    return get_shared(SearchIndex, path)
+
+# Unit/Integration Tests
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = ProgressStore(os.path.join(self.tmpdir.name, "progress.json"), keep_recent=5)
+        entries = [
+            ("Conflict Resolution", "2024-01-05", "We missed the deadline again and I stayed calm.", "Good tone."),
+            ("Storytelling", "2024-02-10", "An old map led me to treasure.", "Engaging story."),
+            ("Conflict Resolution", "2024-03-15", "Let's resolve the conflict about deadlines together.", "Clear."),
+            ("Impromptu Speaking", "2024-03-20", "Teamwork matters.", "Short."),
+        ]
+        for module, date, user_input, feedback in entries:
+            self.store.append({"user_input": user_input, "feedback": feedback,
+                               "module": module, "timestamp": f"{date}T10:00:00"})
+        self.index = SearchIndex(self.store)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_ranked_keyword_search(self):
+        results = self.index.search("conflict deadlines")
+        self.assertEqual(results[0][0], 2)
+        self.assertIn(0, [doc_id for doc_id, _ in results])
+
+    def test_module_and_date_filters(self):
+        self.assertEqual(self.index.search("map", module="Conflict Resolution"), [])
+        results = self.index.search("deadline", date_from="2024-02-01")
+        self.assertEqual([doc_id for doc_id, _ in results], [2])
+
+    def test_incremental_add_and_reload(self):
+        doc_id = self.store.append({"user_input": "Deadline negotiation practice", "feedback": "ok",
+                                    "module": "Conflict Resolution", "timestamp": "2024-04-01T09:00:00"})
+        self.index.add(doc_id, self.store.get(doc_id))
+        reopened = SearchIndex(self.store)
+        self.assertEqual(len(reopened), 5)
+        self.assertEqual(reopened.search("negotiation")[0][0], doc_id)
+
+    def test_sees_saves_from_another_process_and_history_reset(self):
+        other_store = ProgressStore(self.store.path, keep_recent=5)
+        doc_id = other_store.append({"user_input": "Negotiation practice", "feedback": "ok"})
+        SearchIndex(other_store).add(doc_id, other_store.get(doc_id))
+        self.assertEqual(self.index.search("negotiation")[0][0], doc_id)
+        other_store.close()
+        os.remove(self.store.path)
+        doc_id = self.store.append({"user_input": "A map of the office", "feedback": "ok"})
+        self.assertEqual(self.index.search("deadlines"), [])
+        self.index.add(doc_id, self.store.get(doc_id))
+        self.assertEqual([found for found, _ in self.index.search("map")], [doc_id])
+
+    def test_pruned_search_matches_exhaustive_scoring(self):
+        rng = random.Random(7)
+        words = ["clarity", "tone", "deadline", "team", "story", "calm"] + [f"word{i}" for i in range(40)]
+        modules = ["Conflict Resolution", "Storytelling", "Impromptu Speaking"]
+        for i in range(300):
+            self.store.append({"user_input": " ".join(rng.choice(words) for _ in range(rng.randint(3, 30))),
+                               "feedback": "Clarity Score: 7/10", "module": rng.choice(modules),
+                               "timestamp": f"2024-{1 + i // 30:02d}-{1 + i % 28:02d}T10:00:00"})
+        index = SearchIndex(self.store)
+        queries = [("clarity",), ("deadline team",), ("word3 word17",), ("calm tone", "Storytelling"),
+                   ("team story", None, "2024-03-01", "2024-06-30"), ("word5", "Storytelling", "2024-02-01")]
+        for round_no in range(2):
+            for query in queries:
+                expected = index._accumulate(*self.arguments(index, *query))
+                with unittest.mock.patch.multiple("progress_search", EXACT_POSTINGS_LIMIT=0, DIRECT_SCAN_LIMIT=0,
+                                                  ACCUMULATE_LIMIT=0, MAX_CANDIDATES=10 ** 9):
+                    self.assertEqual([doc_id for doc_id, _ in index.search(*query)],
+                                     [doc_id for doc_id, _ in expected], query)
+            # Impact lists built by the first round must stay sorted as entries arrive
+            for i in range(20):
+                doc_id = self.store.append({"user_input": "calm team deadline " * (i % 3 + 1), "feedback": "ok",
+                                            "module": modules[i % 3], "timestamp": "2024-04-01T09:00:00"})
+                index.add(doc_id, self.store.get(doc_id))
+
+    def test_date_filter_on_common_term_returns_full_page(self):
+        for i in range(600):
+            self.store.append({"user_input": f"team update {i % 7}", "feedback": "ok", "module": "Storytelling",
+                               "timestamp": f"2024-{1 + i // 50:02d}-{1 + i % 28:02d}T10:00:00"})
+        index = SearchIndex(self.store)
+        query = ("team", None, "2024-03-01", "2024-03-31")
+        expected = index._accumulate(*self.arguments(index, *query))
+        self.assertEqual(len(expected), 10)
+        # The range holds more entries than a direct scan takes, and most
+        # candidates from the walk fall outside it
+        with unittest.mock.patch.multiple("progress_search", EXACT_POSTINGS_LIMIT=0, DIRECT_SCAN_LIMIT=20,
+                                          ACCUMULATE_LIMIT=0, MAX_CANDIDATES=10):
+            self.assertEqual([doc_id for doc_id, _ in index.search(*query)], [doc_id for doc_id, _ in expected])
+
+    def arguments(self, index, query, module=None, date_from=None, date_to=None, limit=10):
+        doc_count = len(index.lengths)
+        idfs = {term: math.log(1 + (doc_count - len(index.postings[term][0]) + 0.5) / (len(index.postings[term][0]) + 0.5))
+                for term in set(tokenize(query)) if term in index.postings}
+        return idfs, module, date_from, date_to, index.total_length / doc_count, limit
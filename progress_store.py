@@ -0,0 +1,443 @@
+import os
+import io
+import gzip
+import json
+import mmap
+import glob
+import struct
+import bisect
+import time
+import argparse
+import tempfile
+import threading
+import unittest
+import unittest.mock
+from contextlib import contextmanager
+
+# Not available on Windows; there the lock only covers threads of one process
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# zstd gives better ratios and faster reads, gzip is the stdlib fallback
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+KEEP_RECENT = 200
+# Segments below this size are merged once MERGE_FANOUT of them pile up
+SEGMENT_ENTRIES = 10000
+MERGE_FANOUT = 8
+BLOCK_ENTRIES = 64
+# offset, length, first entry number, entry count
+INDEX_RECORD = struct.Struct("<QQQI")
+# A stat taken within a timestamp tick of a change can miss a second change
+# in the same tick, so stamps younger than this are never trusted
+STAMP_SETTLE_NS = 2 * 10 ** 9
+
+# Exclusive across processes through flock on a lockfile, and re-entrant
+# within a process so code holding it (e.g. a sidecar index) can still read
+# the store. Other processes (the API server, the compact CLI) may archive
+# entries at any time, so every read and write holds it.
+class PathLock:
+
+    def __init__(self, lock_path):
+        self.lock_path = lock_path
+        self.lock = threading.RLock()
+        self.depth = 0
+        self.file = None
+
+    @contextmanager
+    def held(self):
+        with self.lock:
+            if self.depth == 0 and fcntl is not None:
+                self.file = open(self.lock_path, "a")
+                fcntl.flock(self.file, fcntl.LOCK_EX)
+            self.depth += 1
+            try:
+                yield
+            finally:
+                self.depth -= 1
+                if self.depth == 0 and self.file is not None:
+                    fcntl.flock(self.file, fcntl.LOCK_UN)
+                    self.file.close()
+                    self.file = None
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+def _lock_for(path):
+    with _locks_guard:
+        key = os.path.abspath(path)
+        if key not in _locks:
+            _locks[key] = PathLock(key + ".lock")
+        return _locks[key]
+
+def _compress(data, codec):
+    if codec == "zst":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=9)
+
+def _decompress(data, codec):
+    if codec == "zst":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read .zst progress segments.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+def _write_atomic(path, data):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if time.time_ns() - st.st_mtime_ns < STAMP_SETTLE_NS:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+class Segment:
+
+    def __init__(self, path):
+        self.path = path
+        self.codec = "zst" if path.endswith(".zst") else "gz"
+        self.index_path = path.rsplit(".jsonl.", 1)[0] + ".idx"
+        with open(self.index_path, "rb") as f:
+            raw = f.read()
+        self.blocks = [INDEX_RECORD.unpack_from(raw, i) for i in range(0, len(raw), INDEX_RECORD.size)]
+        self.block_starts = [block[2] for block in self.blocks]
+        self.first = self.blocks[0][2]
+        self.count = sum(block[3] for block in self.blocks)
+        # Mapped up front so a snapshot stays readable after a merge removes the file
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read_lines(self, block_no):
+        offset, length, first, count = self.blocks[block_no]
+        return _decompress(self._map[offset:offset + length], self.codec).decode("utf-8").splitlines()
+
+    def read_block(self, block_no):
+        return [json.loads(line) for line in self.read_lines(block_no)]
+
+    def read_all(self):
+        return [entry for block_no in range(len(self.blocks)) for entry in self.read_block(block_no)]
+
+    def remove(self):
+        for path in (self.path, self.index_path):
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+# Progress history split into a small active JSON file holding recent entries
+# and immutable compressed JSONL segments holding everything older. Each
+# segment is a run of independently compressed blocks with a sidecar offset
+# index, so any archived entry can be read without decompressing the rest.
+class ProgressStore:
+
+    def __init__(self, path, archive_dir=None, keep_recent=KEEP_RECENT):
+        self.path = path
+        self.archive_dir = archive_dir or os.path.splitext(path)[0] + "_archive"
+        self.keep_recent = keep_recent
+        self.lock = _lock_for(path)
+        self.segments = []
+        self.covered = []
+        self.archive_stamp = None
+        self.active_stamp = None
+        self.active_data = []
+        self._refresh_segments()
+
+    def locked(self):
+        return self.lock.held()
+
+    def _refresh_segments(self):
+        stamp = _stamp(self.archive_dir)
+        if stamp is not None and stamp == self.archive_stamp:
+            return
+        self.archive_stamp = stamp
+        known = {segment.path: segment for segment in self.segments + self.covered}
+        paths = sorted(glob.glob(os.path.join(self.archive_dir, "segment-*.jsonl.*")))
+        # A segment without its index was interrupted mid-compaction
+        found = [known.get(p) or Segment(p) for p in paths if os.path.exists(p.rsplit(".jsonl.", 1)[0] + ".idx")]
+        # A merge interrupted before removing its inputs leaves segments
+        # that the merged one already covers
+        found.sort(key=lambda segment: (segment.first, -segment.count))
+        self.segments, self.covered, end = [], [], 0
+        for segment in found:
+            if segment.first >= end:
+                self.segments.append(segment)
+                end = segment.first + segment.count
+            else:
+                self.covered.append(segment)
+
+    # The parsed active file, reused while the file is unchanged
+    def _active(self):
+        stamp = _stamp(self.path)
+        if stamp is None or stamp != self.active_stamp:
+            self.active_data = self.read_active()
+            self.active_stamp = stamp
+        return self.active_data
+
+    def _snapshot(self):
+        with self.locked():
+            self._refresh_segments()
+            return list(self.segments), self.archived_count, self._active()
+
+    @property
+    def archived_count(self):
+        return self.segments[-1].first + self.segments[-1].count if self.segments else 0
+
+    def read_active(self):
+        if not os.path.exists(self.path) or os.stat(self.path).st_size == 0:
+            return []
+        with open(self.path, "r") as file:
+            try:
+                return json.load(file)
+            except json.JSONDecodeError:
+                return []
+
+    def _write_active(self, data):
+        _write_atomic(self.path, json.dumps(data, separators=(",", ":")).encode("utf-8"))
+
+    def append(self, entry):
+        with self.locked():
+            self._refresh_segments()
+            data = self._active() + [entry]
+            number = self.archived_count + len(data) - 1
+            if len(data) >= 2 * self.keep_recent:
+                data = self._compact(data)
+                self._merge_small(MERGE_FANOUT)
+            self._write_active(data)
+            return number
+
+    def compact(self):
+        with self.locked():
+            self._refresh_segments()
+            data = self._active()
+            if len(data) > self.keep_recent:
+                self._write_active(self._compact(data))
+            self._merge_small(2)
+            for segment in self.covered:
+                segment.remove()
+            self.covered = []
+            return self.archived_count
+
+    def _compact(self, data):
+        cutoff = len(data) - self.keep_recent
+        self.segments.append(self._write_segment(data[:cutoff], self.archived_count))
+        return data[cutoff:]
+
+    # Folds the trailing run of small segments into one, so the segment count
+    # stays low however often entries are archived
+    def _merge_small(self, fanout):
+        run = []
+        for segment in reversed(self.segments):
+            if segment.count >= SEGMENT_ENTRIES:
+                break
+            run.insert(0, segment)
+        if len(run) < fanout:
+            return
+        merged = self._write_segment([entry for segment in run for entry in segment.read_all()], run[0].first)
+        self.segments = self.segments[:-len(run)] + [merged]
+        for segment in run:
+            segment.remove()
+
+    def _write_segment(self, entries, first):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        codec = "zst" if zstandard is not None else "gz"
+        name = os.path.join(self.archive_dir, f"segment-{first:012d}-{first + len(entries) - 1:012d}")
+        if os.path.exists(f"{name}.idx"):
+            raise RuntimeError(f"Progress segment {name} already exists; refusing to overwrite archived history.")
+        body, index = io.BytesIO(), io.BytesIO()
+        for start in range(0, len(entries), BLOCK_ENTRIES):
+            block = entries[start:start + BLOCK_ENTRIES]
+            raw = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in block)
+            compressed = _compress(raw.encode("utf-8"), codec)
+            index.write(INDEX_RECORD.pack(body.tell(), len(compressed), first + start, len(block)))
+            body.write(compressed)
+        # The index is written last: it marks the segment as complete
+        _write_atomic(f"{name}.jsonl.{codec}", body.getvalue())
+        _write_atomic(f"{name}.idx", index.getvalue())
+        return Segment(f"{name}.jsonl.{codec}")
+
+    def __len__(self):
+        _, archived, data = self._snapshot()
+        return archived + len(data)
+
+    def get(self, number):
+        return self.get_many([number])[0]
+
+    # Entries by number from one snapshot, decompressing each block once and
+    # parsing only the requested lines
+    def get_many(self, numbers):
+        segments, archived, data = self._snapshot()
+        starts = [segment.first for segment in segments]
+        blocks, entries = {}, []
+        for number in numbers:
+            if number >= archived:
+                entries.append(data[number - archived])
+                continue
+            segment = segments[bisect.bisect_right(starts, number) - 1]
+            block_no = bisect.bisect_right(segment.block_starts, number) - 1
+            if (segment.first, block_no) not in blocks:
+                blocks[(segment.first, block_no)] = segment.read_lines(block_no)
+            entries.append(json.loads(blocks[(segment.first, block_no)][number - segment.blocks[block_no][2]]))
+        return entries
+
+    def entries(self, start=0):
+        return self._iter_snapshot(self._snapshot(), start)
+
+    def _iter_snapshot(self, snapshot, start):
+        segments, archived, data = snapshot
+        for segment in segments:
+            if segment.first + segment.count <= start:
+                continue
+            for block_no, block in enumerate(segment.blocks):
+                if block[2] + block[3] <= start:
+                    continue
+                for offset, entry in enumerate(segment.read_block(block_no)):
+                    if block[2] + offset >= start:
+                        yield entry
+        for offset, entry in enumerate(data):
+            if archived + offset >= start:
+                yield entry
+
+    def recent(self, limit):
+        return self.recent_with_total(limit)[0]
+
+    # The last entries and the total count, read from one snapshot
+    def recent_with_total(self, limit):
+        snapshot = self._snapshot()
+        _, archived, data = snapshot
+        total = archived + len(data)
+        if len(data) >= limit:
+            return data[len(data) - limit:], total
+        return list(self._iter_snapshot(snapshot, max(0, archived - (limit - len(data))))), total
+
+    def close(self):
+        for segment in self.segments + self.covered:
+            segment.close()
+
+_stores = {}
+_stores_guard = threading.Lock()
+
+# Stores are shared per file so segment indexes and mmaps survive reruns
+def get_store(path):
+    with _stores_guard:
+        key = os.path.abspath(path)
+        if key not in _stores:
+            _stores[key] = ProgressStore(path)
+        return _stores[key]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact progress history into compressed archive segments.")
+    parser.add_argument("command", choices=["compact", "stats"])
+    parser.add_argument("progress_file")
+    parser.add_argument("--keep", type=int, default=KEEP_RECENT, help="Entries kept in the active file.")
+    args = parser.parse_args()
+    store = ProgressStore(args.progress_file, keep_recent=args.keep)
+    if args.command == "compact":
+        store.compact()
+    archive_size = sum(os.path.getsize(p) for p in glob.glob(os.path.join(store.archive_dir, "*")))
+    active_size = os.path.getsize(store.path) if os.path.exists(store.path) else 0
+    print(f"{len(store)} entries: {store.archived_count} archived in {len(store.segments)} segments "
+          f"({archive_size} bytes), {len(store) - store.archived_count} active ({active_size} bytes)")
+    store.close()
+
+# Unit/Integration Tests
+class TestProgressStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "progress.json")
+        self.store = ProgressStore(self.path, keep_recent=10)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_reads_legacy_indented_file(self):
+        with open(self.path, "w") as f:
+            json.dump([{"user_input": "hi", "feedback": "ok"}], f, indent=4)
+        self.assertEqual(self.store.get(0)["user_input"], "hi")
+
+    def test_append_compacts_old_entries(self):
+        for i in range(100):
+            self.store.append({"user_input": f"input {i}", "feedback": "ok"})
+        self.assertEqual(len(self.store), 100)
+        self.assertGreater(self.store.archived_count, 0)
+        self.assertLess(len(self.store.read_active()), 20)
+        self.assertEqual([e["user_input"] for e in self.store.entries()], [f"input {i}" for i in range(100)])
+
+    def test_random_access_into_segments(self):
+        for i in range(100):
+            self.store.append({"user_input": f"input {i}", "feedback": "ok"})
+        reopened = ProgressStore(self.path, keep_recent=10)
+        self.assertEqual(reopened.get(3)["user_input"], "input 3")
+        self.assertEqual(reopened.get(70)["user_input"], "input 70")
+        self.assertEqual([e["user_input"] for e in reopened.get_many([95, 3, 4, 70])],
+                         ["input 95", "input 3", "input 4", "input 70"])
+        self.assertEqual([e["user_input"] for e in reopened.recent(15)], [f"input {i}" for i in range(85, 100)])
+        self.assertEqual(reopened.recent_with_total(5)[1], 100)
+        reopened.close()
+
+    def test_compaction_through_another_instance(self):
+        numbers = [self.store.append({"user_input": f"input {i}", "feedback": "ok"}) for i in range(15)]
+        # e.g. the compact CLI running while the app keeps its cached store
+        other = ProgressStore(self.path, keep_recent=10)
+        self.assertEqual(other.compact(), 5)
+        other.close()
+        numbers += [self.store.append({"user_input": f"input {i}", "feedback": "ok"}) for i in range(15, 40)]
+        self.assertEqual(numbers, list(range(40)))
+        self.assertEqual([e["user_input"] for e in self.store.entries()], [f"input {i}" for i in range(40)])
+        self.assertEqual(self.store.get(2)["user_input"], "input 2")
+        self.assertEqual(len(os.listdir(self.store.archive_dir)), 2 * len(self.store.segments))
+
+    def test_small_segments_are_merged(self):
+        for i in range(300):
+            self.store.append({"user_input": f"input {i}", "feedback": "ok"})
+        # Opened before the merges, so it still holds the original segments
+        other = ProgressStore(self.path, keep_recent=10)
+        for i in range(300, 500):
+            self.store.append({"user_input": f"input {i}", "feedback": "ok"})
+        self.assertLess(len(self.store.segments), MERGE_FANOUT + 2)
+        self.assertEqual([e["user_input"] for e in other.entries()], [f"input {i}" for i in range(500)])
+        self.assertEqual(other.compact(), 490)
+        self.assertEqual(len(other.segments), 1)
+        self.assertEqual(len(os.listdir(other.archive_dir)), 2)
+        self.assertEqual(self.store.get(123)["user_input"], "input 123")
+        other.close()
+
+    def test_unchanged_files_are_not_reread(self):
+        for i in range(50):
+            self.store.append({"user_input": f"input {i}", "feedback": "ok"})
+        with unittest.mock.patch(__name__ + ".STAMP_SETTLE_NS", 0):
+            self.store.get(0)
+            with unittest.mock.patch("glob.glob") as globbed, \
+                    unittest.mock.patch.object(self.store, "read_active") as read:
+                self.assertEqual(self.store.get(45)["user_input"], "input 45")
+                self.assertEqual(len(self.store), 50)
+            globbed.assert_not_called()
+            read.assert_not_called()
+            other = ProgressStore(self.path, keep_recent=10)
+            other.append({"user_input": "input 50", "feedback": "ok"})
+            other.close()
+            self.assertEqual(self.store.get(50)["user_input"], "input 50")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import os
+import time
+import tempfile
+import threading
+import unittest
+
+MEMORY_CAP_BYTES = int(os.environ.get("VERBAL_TRAINER_SESSION_MEMORY_CAP", 8 * 1024 * 1024))
+IDLE_TIMEOUT = float(os.environ.get("VERBAL_TRAINER_SESSION_IDLE_TIMEOUT", 30 * 60))
+EVICTION_INTERVAL = 60
+
+# Transcript kept as a list of chunks; the joined text is only built when read
+class TranscriptBuffer:
+
+    def __init__(self, session=None):
+        self.session = session
+        self.chunks = []
+        self.word_count = 0
+        self.nbytes = 0
+        self._text = ""
+
+    def append(self, text):
+        text = text.strip()
+        if not text:
+            return
+        self.chunks.append(text)
+        self.word_count += len(text.split())
+        self.nbytes += len(text.encode("utf-8")) + 1
+        self._text = None
+        if self.session is not None:
+            self.session.touch()
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = " ".join(self.chunks)
+        return self._text
+
+    def clear(self):
+        self.chunks = []
+        self.word_count = 0
+        self.nbytes = 0
+        self._text = ""
+
+    def __str__(self):
+        return self.text
+
+    def __bool__(self):
+        return bool(self.chunks)
+
+# Captured audio frames. Chunks stay in memory until the owning session goes
+# over its cap, after which they are appended to a temporary spill file.
+class SessionAudio:
+
+    def __init__(self, session):
+        self.session = session
+        self.chunks = []
+        self.sample_rate = None
+        self.sample_width = None
+        self.memory_bytes = 0
+        self.spilled_bytes = 0
+        self.spill_path = None
+
+    def append(self, audio):
+        self.sample_rate = audio.sample_rate
+        self.sample_width = audio.sample_width
+        self.chunks.append(audio.frame_data)
+        self.memory_bytes += len(audio.frame_data)
+        self.session.touch()
+        self.session.enforce_cap()
+
+    def spill(self):
+        if not self.memory_bytes:
+            return 0
+        if self.spill_path is None:
+            fd, self.spill_path = tempfile.mkstemp(prefix="verbal_trainer_audio_", suffix=".raw")
+            os.close(fd)
+        freed = self.memory_bytes
+        with open(self.spill_path, "ab") as f:
+            for chunk in self.chunks:
+                f.write(chunk)
+        self.spilled_bytes += freed
+        self.chunks = []
+        self.memory_bytes = 0
+        return freed
+
+    def frame_data(self):
+        spilled = b""
+        if self.spill_path is not None:
+            with open(self.spill_path, "rb") as f:
+                spilled = f.read()
+        return spilled + b"".join(self.chunks)
+
+    def __bool__(self):
+        return bool(self.memory_bytes or self.spilled_bytes)
+
+    def clear(self):
+        if self.spill_path is not None and os.path.exists(self.spill_path):
+            os.unlink(self.spill_path)
+        self.spill_path = None
+        self.chunks = []
+        self.memory_bytes = 0
+        self.spilled_bytes = 0
+
+class SessionMemory:
+
+    def __init__(self, session_id, cap_bytes=MEMORY_CAP_BYTES):
+        self.session_id = session_id
+        self.cap_bytes = cap_bytes
+        self.transcripts = {}
+        self.audio_buffers = {}
+        self.last_access = time.monotonic()
+
+    def transcript(self, name):
+        if name not in self.transcripts:
+            self.transcripts[name] = TranscriptBuffer(self)
+        return self.transcripts[name]
+
+    def audio(self, name):
+        if name not in self.audio_buffers:
+            self.audio_buffers[name] = SessionAudio(self)
+        return self.audio_buffers[name]
+
+    # A recording loop can outlast IDLE_TIMEOUT within one rerun, so every
+    # append counts as activity, not just get_session()
+    def touch(self):
+        self.last_access = time.monotonic()
+
+    def memory_bytes(self):
+        return (sum(buffer.nbytes for buffer in self.transcripts.values())
+                + sum(buffer.memory_bytes for buffer in self.audio_buffers.values()))
+
+    def enforce_cap(self):
+        # Transcripts are small and needed for display, so only audio spills
+        for buffer in sorted(self.audio_buffers.values(), key=lambda b: b.memory_bytes, reverse=True):
+            if self.memory_bytes() <= self.cap_bytes:
+                break
+            buffer.spill()
+
+    def report(self):
+        return {
+            "session_id": self.session_id,
+            "memory_bytes": self.memory_bytes(),
+            "transcript_bytes": sum(buffer.nbytes for buffer in self.transcripts.values()),
+            "audio_memory_bytes": sum(buffer.memory_bytes for buffer in self.audio_buffers.values()),
+            "audio_spilled_bytes": sum(buffer.spilled_bytes for buffer in self.audio_buffers.values()),
+            "idle_seconds": round(time.monotonic() - self.last_access, 1),
+        }
+
+    def close(self):
+        for buffer in self.audio_buffers.values():
+            buffer.clear()
+        for buffer in self.transcripts.values():
+            buffer.clear()
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_last_eviction = 0.0
+
+def get_session(session_id):
+    global _last_eviction
+    now = time.monotonic()
+    with _sessions_lock:
+        if now - _last_eviction > EVICTION_INTERVAL:
+            _last_eviction = now
+            _evict_idle(now, IDLE_TIMEOUT)
+        if session_id not in _sessions:
+            _sessions[session_id] = SessionMemory(session_id)
+        session = _sessions[session_id]
+        session.last_access = now
+        return session
+
+def evict_idle(max_idle=IDLE_TIMEOUT):
+    with _sessions_lock:
+        return _evict_idle(time.monotonic(), max_idle)
+
+def _evict_idle(now, max_idle):
+    idle = [sid for sid, session in _sessions.items() if now - session.last_access > max_idle]
+    for session_id in idle:
+        _sessions.pop(session_id).close()
+    return idle
+
+def memory_report():
+    with _sessions_lock:
+        return [session.report() for session in _sessions.values()]
+
+def current_session_id():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "local"
+
+# Unit/Integration Tests
+class FakeAudio:
+
+    def __init__(self, frame_data):
+        self.frame_data = frame_data
+        self.sample_rate = 16000
+        self.sample_width = 2
+
+class TestSessionMemory(unittest.TestCase):
+
+    def test_transcript_buffer(self):
+        buffer = TranscriptBuffer()
+        buffer.append("hello there")
+        buffer.append(" general kenobi ")
+        self.assertEqual(buffer.text, "hello there general kenobi")
+        self.assertEqual(buffer.word_count, 4)
+
+    def test_audio_spills_over_cap(self):
+        session = SessionMemory("test", cap_bytes=10)
+        audio = session.audio("voice")
+        audio.append(FakeAudio(b"12345678"))
+        self.assertEqual(audio.spilled_bytes, 0)
+        audio.append(FakeAudio(b"abcdefgh"))
+        self.assertEqual(audio.memory_bytes, 0)
+        self.assertEqual(audio.frame_data(), b"12345678abcdefgh")
+        spill_path = audio.spill_path
+        session.close()
+        self.assertFalse(os.path.exists(spill_path))
+
+    def test_idle_sessions_are_evicted(self):
+        get_session("idle-test").transcript("voice").append("hi")
+        self.assertIn("idle-test", evict_idle(max_idle=-1))
+        self.assertNotIn("idle-test", [report["session_id"] for report in memory_report()])
+
+    def test_appends_keep_session_alive(self):
+        session = get_session("recording-test")
+        for append in (lambda: session.transcript("voice").append("hi"),
+                       lambda: session.audio("voice").append(FakeAudio(b"1234"))):
+            session.last_access -= 100
+            append()
+            self.assertNotIn("recording-test", evict_idle(max_idle=50))
+        evict_idle(max_idle=-1)
@@ -0,0 +1,215 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import unittest
+
+from progress_store import ProgressStore, get_store
+
+# Identifies the history a sidecar was built from, so an index left behind
+# by a deleted or reset progress file is rebuilt instead of reused
+def fingerprint(entry):
+    return hashlib.blake2b(json.dumps(entry, sort_keys=True).encode("utf-8"), digest_size=8).hexdigest()
+
+# In-memory index over progress entries backed by an append-only JSONL
+# sidecar, so adding an entry costs one line of I/O and reopening only
+# replays the sidecar. The first line records the store's fingerprint.
+# Subclasses build one record per entry and apply it.
+#
+# The app and the API server may share one progress file, so the sidecar is
+# only written while holding the store's lock, and each process replays
+# lines the other appended before indexing anything itself.
+class SidecarIndex:
+
+    SUFFIX = "_index.jsonl"
+
+    def __init__(self, store, index_path=None):
+        self.store = store
+        self.index_path = index_path or os.path.splitext(store.path)[0] + self.SUFFIX
+        self.lock = threading.Lock()
+        self._reset()
+        self.refresh()
+
+    def __len__(self):
+        return self.count
+
+    def _clear(self):
+        raise NotImplementedError
+
+    def _build_record(self, doc_id, entry):
+        raise NotImplementedError
+
+    def _add_record(self, record):
+        raise NotImplementedError
+
+    def _reset(self):
+        self.count = 0
+        self.offset = 0
+        self.store_fingerprint = None
+        self._clear()
+
+    def add(self, doc_id, entry):
+        with self.lock, self.store.locked():
+            self._catch_up({doc_id: entry})
+
+    # Called before each query: picks up entries saved by other processes
+    def refresh(self):
+        with self.lock:
+            if len(self.store) != self.count:
+                with self.store.locked():
+                    self._catch_up({})
+
+    def _catch_up(self, known):
+        self._replay()
+        size = len(self.store)
+        current = fingerprint(known.get(0) or self.store.get(0)) if size else None
+        if self.count > size or (self.offset and self.store_fingerprint != current):
+            self._reset()
+            os.truncate(self.index_path, 0)
+        if self.count == size:
+            return
+        lines = [] if self.offset else [json.dumps({"store": current}, separators=(",", ":")) + "\n"]
+        for doc_id in range(self.count, size):
+            entry = known.get(doc_id)
+            if entry is None:
+                break
+            lines.append(self._line(doc_id, entry))
+        else:
+            doc_id = size
+        lines.extend(self._line(number, entry) for number, entry in enumerate(self.store.entries(doc_id), doc_id))
+        data = "".join(lines).encode("utf-8")
+        with open(self.index_path, "ab") as f:
+            f.write(data)
+        self.offset += len(data)
+        self.store_fingerprint = current
+
+    def _line(self, doc_id, entry):
+        record = self._build_record(doc_id, entry)
+        self._add_record(record)
+        self.count += 1
+        return json.dumps(record, separators=(",", ":")) + "\n"
+
+    # Applies sidecar lines appended since the last replay
+    def _replay(self):
+        size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        if size < self.offset:
+            self._reset()
+        if size == self.offset:
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if self.offset == 0:
+                    # Sidecars written before the header existed are rebuilt
+                    if "store" not in record:
+                        break
+                    self.store_fingerprint = record["store"]
+                elif record.get("id") == self.count:
+                    self._add_record(record)
+                    self.count += 1
+                else:
+                    break
+                self.offset += len(line)
+        # Drop a torn or out-of-order tail; those entries are indexed again
+        if size > self.offset:
+            os.truncate(self.index_path, self.offset)
+
+_indexes = {}
+_indexes_guard = threading.Lock()
+
+# Indexes are shared per progress file so they survive reruns
+def get_shared(cls, path):
+    with _indexes_guard:
+        key = (cls, os.path.abspath(path))
+        if key not in _indexes:
+            _indexes[key] = cls(get_store(path))
+        return _indexes[key]
+
+# Unit/Integration Tests
+class InputLengthIndex(SidecarIndex):
+
+    SUFFIX = "_lengths.jsonl"
+
+    def _clear(self):
+        self.lengths = []
+
+    def _build_record(self, doc_id, entry):
+        return {"id": doc_id, "length": len(entry["user_input"])}
+
+    def _add_record(self, record):
+        self.lengths.append(record["length"])
+
+class TestSidecarIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = ProgressStore(os.path.join(self.tmpdir.name, "progress.json"))
+        for text in ["a", "bb", "ccc"]:
+            self.store.append({"user_input": text, "feedback": "ok"})
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_torn_tail_is_reindexed(self):
+        index = InputLengthIndex(self.store)
+        with open(index.index_path, "a") as f:
+            f.write('{"id": 3, "len')
+        reopened = InputLengthIndex(self.store)
+        self.assertEqual(reopened.lengths, [1, 2, 3])
+        doc_id = self.store.append({"user_input": "dddd", "feedback": "ok"})
+        reopened.add(doc_id, self.store.get(doc_id))
+        self.assertEqual(InputLengthIndex(self.store).lengths, [1, 2, 3, 4])
+
+    def test_missed_entries_are_synced_on_add(self):
+        index = InputLengthIndex(self.store)
+        self.store.append({"user_input": "dddd", "feedback": "ok"})
+        doc_id = self.store.append({"user_input": "eeeee", "feedback": "ok"})
+        index.add(doc_id, self.store.get(doc_id))
+        self.assertEqual(index.lengths, [1, 2, 3, 4, 5])
+
+    def test_rebuilt_after_history_reset(self):
+        InputLengthIndex(self.store)
+        os.remove(self.store.path)
+        doc_id = self.store.append({"user_input": "zz", "feedback": "ok"})
+        index = InputLengthIndex(self.store)
+        self.assertEqual(index.lengths, [2])
+        # Regrown past the old count before the index saw the reset
+        for text in ["yyy", "x", "wwww"]:
+            doc_id = self.store.append({"user_input": text, "feedback": "ok"})
+        index.add(doc_id, self.store.get(doc_id))
+        os.remove(self.store.path)
+        for text in ["vvvvv", "u", "tt", "sss", "rrrr"]:
+            self.store.append({"user_input": text, "feedback": "ok"})
+        index.refresh()
+        self.assertEqual(index.lengths, [5, 1, 2, 3, 4])
+        self.assertEqual(InputLengthIndex(self.store).lengths, [5, 1, 2, 3, 4])
+
+    def test_legacy_sidecar_is_rebuilt(self):
+        path = os.path.splitext(self.store.path)[0] + InputLengthIndex.SUFFIX
+        with open(path, "w") as f:
+            f.write('{"id":0,"length":9}\n')
+        self.assertEqual(InputLengthIndex(self.store).lengths, [1, 2, 3])
+
+    def test_entries_saved_by_another_process(self):
+        # Separate store and index objects stand in for the app and the API server
+        other_store = ProgressStore(self.store.path)
+        index, other = InputLengthIndex(self.store), InputLengthIndex(other_store)
+        doc_id = other_store.append({"user_input": "dddd", "feedback": "ok"})
+        other.add(doc_id, other_store.get(doc_id))
+        index.refresh()
+        self.assertEqual(index.lengths, [1, 2, 3, 4])
+        doc_id = self.store.append({"user_input": "eeeee", "feedback": "ok"})
+        index.add(doc_id, self.store.get(doc_id))
+        other.refresh()
+        self.assertEqual(other.lengths, [1, 2, 3, 4, 5])
+        with open(index.index_path) as f:
+            self.assertEqual([json.loads(line).get("id") for line in f], [None, 0, 1, 2, 3, 4])
+        other_store.close()
@@ -0,0 +1,184 @@
+import unittest
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from evaluation import GENERAL_MODULE, build_prompt, generate_feedback, FakeGenerativeModel
+
+MAX_DRAFTS = 4
+DRAFT_TIMEOUT = 15
+
+# Speech goes through a single thread so the TTS engine is never re-entered.
+# Persistence has its own pool so saves never queue behind draft analyses,
+# and drafts only start while a draft worker is free.
+_speech_executor = ThreadPoolExecutor(max_workers=1)
+_background_executor = ThreadPoolExecutor(max_workers=2)
+_draft_executor = ThreadPoolExecutor(max_workers=MAX_DRAFTS)
+_draft_slots = threading.BoundedSemaphore(MAX_DRAFTS)
+
+def _report_errors(future):
+    error = future.exception()
+    if error is not None:
+        print(f"Background task failed: {error}")
+
+def run_in_background(fn, *args, **kwargs):
+    future = _background_executor.submit(fn, *args, **kwargs)
+    future.add_done_callback(_report_errors)
+    return future
+
+def speak_in_background(speak_text, text):
+    future = _speech_executor.submit(speak_text, text)
+    future.add_done_callback(_report_errors)
+    return future
+
+def _normalize(words):
+    return [word.strip(".,!?;:\"'").lower() for word in words]
+
+def build_refine_prompt(draft_feedback, delta):
+    return (f"Here is structured feedback (clarity, tone, engagement scores out of 10) you gave on the first part of a spoken response:\n\n"
+            f"{draft_feedback}\n\n"
+            f"The speaker then continued with:\n\n{delta}\n\n"
+            f"Update the feedback so it covers the complete response. Keep the same structure and scores out of 10.")
+
+# Starts a draft analysis on the transcript-so-far while the user is still
+# speaking, then refines it with only the new words once recording stops.
+class SpeculativeEvaluator:
+
+    def __init__(self, module=GENERAL_MODULE, model=None, generate=None, prompt_fn=None, min_new_words=12):
+        self.module = module
+        self.generate = generate or (lambda prompt: generate_feedback(prompt, model))
+        self.prompt_fn = prompt_fn or (lambda text: build_prompt(text, module))
+        self.min_new_words = min_new_words
+        self.draft_input = ""
+        self.draft_words = 0
+        self.draft_future = None
+        self.lock = threading.Lock()
+
+    # word_count lets callers with a chunked transcript skip building the text
+    def update(self, transcript, word_count=None):
+        with self.lock:
+            if self.draft_future is not None and not self.draft_future.done():
+                return False
+            if word_count is None:
+                word_count = len(str(transcript).split())
+            if word_count - self.draft_words < self.min_new_words:
+                return False
+            # Speculation is optional: skip it rather than wait behind other sessions
+            if not _draft_slots.acquire(blocking=False):
+                return False
+            self.draft_input = str(transcript).strip()
+            self.draft_words = word_count
+            self.draft_future = _draft_executor.submit(self.generate, self.prompt_fn(transcript))
+            self.draft_future.add_done_callback(lambda future: _draft_slots.release())
+            return True
+
+    def draft(self, timeout=None):
+        with self.lock:
+            draft_input, future = self.draft_input, self.draft_future
+        if future is None:
+            return None, None
+        try:
+            return draft_input, future.result(timeout=timeout)
+        except Exception as e:
+            print(f"Draft analysis failed: {e}")
+            return None, None
+
+    def finalize(self, transcript, timeout=DRAFT_TIMEOUT):
+        transcript = transcript.strip()
+        with self.lock:
+            # A draft still waiting for a worker is no head start
+            if self.draft_future is not None and self.draft_future.cancel():
+                self.draft_future = None
+        draft_input, draft_feedback = self.draft(timeout)
+        words = transcript.split()
+        draft_words = draft_input.split() if draft_input else []
+        # Re-transcribed audio may differ in case and punctuation only
+        if draft_feedback is None or _normalize(words[:len(draft_words)]) != _normalize(draft_words):
+            return self.generate(self.prompt_fn(transcript))
+        delta = " ".join(words[len(draft_words):])
+        if not delta:
+            return draft_feedback
+        return self.generate(build_refine_prompt(draft_feedback, delta))
+
+    def reset(self):
+        with self.lock:
+            self.draft_input = ""
+            self.draft_words = 0
+            self.draft_future = None
+
+# Unit/Integration Tests
+class TestSpeculativeEvaluator(unittest.TestCase):
+
+    def setUp(self):
+        self.prompts = []
+        self.entered = threading.Event()
+        model = FakeGenerativeModel()
+
+        def generate(prompt):
+            self.prompts.append(prompt)
+            self.entered.set()
+            return generate_feedback(prompt, model)
+
+        self.evaluator = SpeculativeEvaluator("Storytelling", generate=generate, min_new_words=3)
+
+    # finalize() cancels a draft still waiting for a worker, so wait until it runs
+    def start_draft(self, transcript):
+        self.assertTrue(self.evaluator.update(transcript))
+        self.assertTrue(self.entered.wait(5))
+
+    def test_short_transcript_does_not_start_draft(self):
+        self.assertFalse(self.evaluator.update("one two"))
+
+    def test_unchanged_transcript_reuses_draft(self):
+        self.start_draft("one two three four")
+        feedback = self.evaluator.finalize("one two three four")
+        self.assertEqual(len(self.prompts), 1)
+        self.assertIn("one two three four", self.prompts[0])
+        self.assertEqual(feedback, self.evaluator.draft()[1])
+
+    def test_delta_is_refined(self):
+        self.start_draft("one two three four")
+        self.evaluator.finalize("one two three four five six")
+        self.assertEqual(len(self.prompts), 2)
+        self.assertIn("The speaker then continued with:\n\nfive six", self.prompts[1])
+        self.assertNotIn("one two", self.prompts[1])
+
+    def test_retranscribed_punctuation_still_matches_draft(self):
+        self.start_draft("one two three four")
+        feedback = self.evaluator.finalize("One two, three four.")
+        self.assertEqual(len(self.prompts), 1)
+        self.assertEqual(feedback, self.evaluator.draft()[1])
+
+    def test_diverged_transcript_is_evaluated_in_full(self):
+        self.start_draft("one two three four")
+        self.evaluator.finalize("something else entirely")
+        self.assertEqual(len(self.prompts), 2)
+        self.assertIn("something else entirely", self.prompts[1])
+
+    def test_queued_draft_is_cancelled(self):
+        release = threading.Event()
+        # Occupy every draft worker without taking a draft slot
+        blockers = [_draft_executor.submit(release.wait, 5) for _ in range(MAX_DRAFTS)]
+        try:
+            self.assertTrue(self.evaluator.update("one two three four"))
+            self.evaluator.finalize("one two three four")
+            self.assertEqual(len(self.prompts), 1)
+            self.assertIsNone(self.evaluator.draft_future)
+        finally:
+            release.set()
+            for blocker in blockers:
+                blocker.result()
+
+    def test_drafts_are_bounded(self):
+        release = threading.Event()
+        evaluators = [SpeculativeEvaluator(generate=lambda prompt: release.wait(5) and "ok", min_new_words=1)
+                      for _ in range(MAX_DRAFTS + 1)]
+        try:
+            started = [evaluator.update("one two three") for evaluator in evaluators]
+            self.assertEqual(started, [True] * MAX_DRAFTS + [False])
+        finally:
+            release.set()
+            # Slots are released by done callbacks; wait until all are back
+            for _ in range(MAX_DRAFTS):
+                _draft_slots.acquire(timeout=5)
+            for _ in range(MAX_DRAFTS):
+                _draft_slots.release()